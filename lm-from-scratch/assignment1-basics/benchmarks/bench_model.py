@@ -0,0 +1,120 @@
+"""
+Compare the forward pass of TransformerLM with fused QKV and W1/W3 projections against the same model
+with separate q/k/v and w1/w3 projections, loaded with the same weights.
+
+    uv run python -m benchmarks.bench_model
+    uv run python -m benchmarks.bench_model --device cuda --batch-size 16 --d-model 768 --num-layers 12
+"""
+import argparse
+import statistics
+import time
+
+import torch
+
+from cs336_basics.model import Linear, MultiHeadSelfAttention, TransformerLM
+from cs336_basics.model.layers import silu
+
+from .common import print_table
+
+
+class UnfusedMultiHeadSelfAttention(MultiHeadSelfAttention):
+    def __init__(self, d_model: int, num_heads: int, rope=None, device=None, dtype=None):
+        super().__init__(d_model, num_heads, rope, device=device, dtype=dtype)
+        del self.qkv_proj
+        self.q_proj = Linear(d_model, d_model, device=device, dtype=dtype)
+        self.k_proj = Linear(d_model, d_model, device=device, dtype=dtype)
+        self.v_proj = Linear(d_model, d_model, device=device, dtype=dtype)
+
+    def project_qkv(self, x: torch.Tensor) -> tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+        return self.q_proj(x), self.k_proj(x), self.v_proj(x)
+
+    def _load_from_state_dict(self, *args, **kwargs):
+        torch.nn.Module._load_from_state_dict(self, *args, **kwargs)
+
+
+class UnfusedSwiGLU(torch.nn.Module):
+    def __init__(self, d_model: int, d_ff: int, device=None, dtype=None):
+        super().__init__()
+        self.w1 = Linear(d_model, d_ff, device=device, dtype=dtype)
+        self.w2 = Linear(d_ff, d_model, device=device, dtype=dtype)
+        self.w3 = Linear(d_model, d_ff, device=device, dtype=dtype)
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        return self.w2(silu(self.w1(x)) * self.w3(x))
+
+
+def unfused_lm(config: dict, device: torch.device, dtype: torch.dtype) -> TransformerLM:
+    """A TransformerLM in the layout of the reference state dict: one matmul per projection."""
+    model = TransformerLM(**config, device=device, dtype=dtype)
+    for block in model.layers:
+        block.attn = UnfusedMultiHeadSelfAttention(
+            config["d_model"], config["num_heads"], block.attn.rope, device=device, dtype=dtype
+        )
+        block.ffn = UnfusedSwiGLU(config["d_model"], config["d_ff"], device=device, dtype=dtype)
+    return model
+
+
+def time_forward(model: TransformerLM, token_ids: torch.Tensor, repeats: int) -> float:
+    """Median seconds of a forward pass, after a warmup pass."""
+    times = []
+    with torch.inference_mode():
+        for _ in range(repeats + 1):
+            if token_ids.is_cuda:
+                torch.cuda.synchronize()
+            start = time.perf_counter()
+            model(token_ids)
+            if token_ids.is_cuda:
+                torch.cuda.synchronize()
+            times.append(time.perf_counter() - start)
+    return statistics.median(times[1:])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--device", default="cuda" if torch.cuda.is_available() else "cpu")
+    parser.add_argument("--dtype", default="float32", choices=["float32", "bfloat16", "float16"])
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--context-length", type=int, default=256)
+    parser.add_argument("--vocab-size", type=int, default=10000)
+    parser.add_argument("--d-model", type=int, default=512)
+    parser.add_argument("--num-layers", type=int, default=4)
+    parser.add_argument("--num-heads", type=int, default=16)
+    parser.add_argument("--d-ff", type=int, default=1344)
+    parser.add_argument("--repeats", type=int, default=10)
+    args = parser.parse_args()
+
+    device, dtype = torch.device(args.device), getattr(torch, args.dtype)
+    config = {
+        "vocab_size": args.vocab_size,
+        "context_length": args.context_length,
+        "d_model": args.d_model,
+        "num_layers": args.num_layers,
+        "num_heads": args.num_heads,
+        "d_ff": args.d_ff,
+    }
+    unfused = unfused_lm(config, device, dtype)
+    fused = TransformerLM(**config, device=device, dtype=dtype)
+    # the unfused model's state dict has the reference keys, which the fused model loads
+    fused.load_state_dict(unfused.state_dict())
+    token_ids = torch.randint(0, args.vocab_size, (args.batch_size, args.context_length), device=device)
+    with torch.inference_mode():
+        max_diff = (fused(token_ids) - unfused(token_ids)).abs().max().item()
+
+    rows = []
+    num_tokens = args.batch_size * args.context_length
+    seconds = {
+        name: time_forward(model, token_ids, args.repeats) for name, model in [("unfused", unfused), ("fused", fused)]
+    }
+    for name, s in seconds.items():
+        rows.append({
+            "layout": name,
+            "forward": f"{s * 1e3:.2f} ms",
+            "tokens/s": f"{num_tokens / s:,.0f}",
+            "speedup": f"{seconds['unfused'] / s:.2f}x",
+        })
+    print(f"device {device}, dtype {args.dtype}, max |fused - unfused| logit difference {max_diff:.2e}")
+    print_table(rows, ["layout", "forward", "tokens/s", "speedup"])
+
+
+if __name__ == "__main__":
+    main()
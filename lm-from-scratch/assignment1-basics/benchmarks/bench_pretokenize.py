@@ -0,0 +1,44 @@
+"""
+Compare the pretokenizer scanner against running the GPT-2 PAT regex directly.
+
+    uv run python -m benchmarks.bench_pretokenize
+    uv run python -m benchmarks.bench_pretokenize --inputs corpus.en synthetic_unicode --synthetic-mb 4
+"""
+import argparse
+
+from cs336_basics.pretokenizer import pretoken_spans, pretokenize
+from cs336_basics.tokenizer import pretokenize_regex
+
+from .bench_tokenizer import FIXTURES, SYNTHETIC, best_time, load_input
+from .common import print_table
+
+METHODS = {
+    "regex": lambda text: list(pretokenize_regex(text)),
+    "scanner": lambda text: list(pretokenize(text)),
+    "scanner spans": lambda text: list(pretoken_spans(text)),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--inputs", nargs="+", default=FIXTURES + SYNTHETIC, choices=FIXTURES + SYNTHETIC)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--synthetic-mb", type=float, default=8.0, help="size of each synthetic input")
+    args = parser.parse_args()
+
+    rows = []
+    for input_name in args.inputs:
+        text = load_input(input_name, args.synthetic_mb)
+        if list(pretokenize(text)) != list(pretokenize_regex(text)):
+            raise AssertionError(f"scanner and regex disagree on {input_name}")
+        num_bytes = len(text.encode("utf-8"))
+        seconds = {name: best_time(lambda: method(text), args.repeats)[0] for name, method in METHODS.items()}
+        row = {"input": input_name, "MB": f"{num_bytes / 1e6:.2f}"}
+        row.update({f"{name} MB/s": f"{num_bytes / s / 1e6:.2f}" for name, s in seconds.items()})
+        row["speedup"] = f"{seconds['regex'] / seconds['scanner']:.2f}x"
+        rows.append(row)
+    print_table(rows, ["input", "MB", *(f"{name} MB/s" for name in METHODS), "speedup"])
+
+
+if __name__ == "__main__":
+    main()
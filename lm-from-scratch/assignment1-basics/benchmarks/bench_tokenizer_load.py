@@ -0,0 +1,57 @@
+"""
+Compare tokenizer load time from the GPT-2 json/merges fixtures against the memory-mapped binary format.
+
+    uv run python -m benchmarks.bench_tokenizer_load
+"""
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from cs336_basics.bpe_tokenizer import BPETokenizer
+from cs336_basics.compact_bpe_tokenizer import CompactBPETokenizer
+from tests.common import FIXTURES_PATH, GPT2_MERGES_PATH, GPT2_VOCAB_PATH, load_gpt2_params
+
+from .common import print_table
+
+REPEATS = 5
+
+
+def time_load(load, text: str | None) -> tuple[float, float | None]:
+    """Median seconds to load, and to load plus encode `text`."""
+    load_s, first_encode_s = [], []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        tokenizer = load()
+        load_s.append(time.perf_counter() - start)
+        if text is not None:
+            tokenizer.encode(text)
+            first_encode_s.append(time.perf_counter() - start)
+    return statistics.median(load_s), statistics.median(first_encode_s) if first_encode_s else None
+
+
+def main():
+    special_tokens = ["<|endoftext|>"]
+    with open(FIXTURES_PATH / "address.txt") as f:
+        text = f.read()
+    with tempfile.TemporaryDirectory() as tmp:
+        binary_path = Path(tmp) / "gpt2.bpe"
+        BPETokenizer(load_gpt2_params(special_tokens)).save_binary(binary_path)
+        loaders = {
+            "BPETokenizer.from_files": lambda: BPETokenizer.from_files(GPT2_VOCAB_PATH, GPT2_MERGES_PATH, special_tokens),
+            "BPETokenizer(gpt2 params)": lambda: BPETokenizer(load_gpt2_params(special_tokens)),
+            "CompactBPETokenizer(gpt2 params)": lambda: CompactBPETokenizer(load_gpt2_params(special_tokens)),
+            "CompactBPETokenizer.load_binary": lambda: CompactBPETokenizer.load_binary(binary_path),
+        }
+        rows = []
+        for name, load in loaders.items():
+            # from_files reads the fixture's byte-to-unicode remapped strings as raw bytes, so it cannot encode
+            load_s, first_encode_s = time_load(load, None if name.endswith("from_files") else text)
+            first_encode = "n/a" if first_encode_s is None else f"{first_encode_s * 1e3:.2f} ms"
+            rows.append({"loader": name, "load": f"{load_s * 1e3:.2f} ms", "load + first encode": first_encode})
+        print(f"binary file: {binary_path.stat().st_size / 2**20:.2f} MB")
+        print_table(rows, ["loader", "load", "load + first encode"])
+
+
+if __name__ == "__main__":
+    main()
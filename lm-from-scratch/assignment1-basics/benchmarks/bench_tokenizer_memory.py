@@ -0,0 +1,52 @@
+"""
+Compare the memory held by a dict-backed BPETokenizer and a CompactBPETokenizer built from the GPT-2 fixtures.
+
+    uv run python -m benchmarks.bench_tokenizer_memory
+"""
+import time
+import tracemalloc
+
+from cs336_basics.bpe_tokenizer import BPETokenizer
+from cs336_basics.compact_bpe_tokenizer import CompactBPETokenizer, memory_footprint
+from tests.common import FIXTURES_PATH, load_gpt2_params
+
+from .common import fmt_bytes, print_table
+
+ATTRIBUTES = ["vocab", "bytes_to_idx", "merges_idx", "merge_ranks", "total"]
+
+
+def measure(tokenizer_cls: type[BPETokenizer]) -> dict:
+    params = load_gpt2_params(["<|endoftext|>"])
+    tracemalloc.start()
+    tokenizer = tokenizer_cls(params)
+    del params
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    with open(FIXTURES_PATH / "tinystories_sample.txt") as f:
+        text = f.read()
+    start = time.perf_counter()
+    for _ in range(20):
+        tokenizer.cache_clear()
+        ids = tokenizer.encode(text)
+    encode_s = (time.perf_counter() - start) / 20
+    assert tokenizer.decode(ids) == text
+    footprint = memory_footprint(tokenizer)
+    row = {
+        "tokenizer": tokenizer_cls.__name__,
+        "retained (tracemalloc)": fmt_bytes(retained),
+        "peak while building": fmt_bytes(peak),
+    }
+    row.update({name: fmt_bytes(footprint.get(name, 0)) for name in ATTRIBUTES})
+    row["encode (uncached)"] = f"{encode_s * 1e3:.1f} ms"
+    return row
+
+
+def main():
+    print_table(
+        [measure(BPETokenizer), measure(CompactBPETokenizer)],
+        ["tokenizer", "retained (tracemalloc)", "peak while building", *ATTRIBUTES, "encode (uncached)"],
+    )
+
+
+if __name__ == "__main__":
+    main()
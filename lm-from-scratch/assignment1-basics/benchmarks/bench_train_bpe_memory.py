@@ -0,0 +1,86 @@
+"""
+Compare the memory held by the BPE training word table as a dict of tuple-of-bytes words against the flat
+`WordTable` arrays, applying the same merges to both.
+
+    uv run python -m benchmarks.bench_train_bpe_memory
+    uv run python -m benchmarks.bench_train_bpe_memory --inputs corpus.en --vocab-size 1000
+"""
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+from cs336_basics.train_bpe import BPETrainer, WordTable, _merge_word, count_pretokens
+from tests.common import FIXTURES_PATH
+
+from .common import fmt_bytes, print_table
+
+INPUTS = ["corpus.en", "tinystories_sample.txt"]
+SPECIAL_TOKENS = ["<|endoftext|>"]
+
+
+def tuple_of_bytes(pretoken_counts: dict[bytes, int], merges: list[tuple[bytes, bytes]]):
+    words = {tuple(bytes([b]) for b in pretoken): count for pretoken, count in pretoken_counts.items()}
+    for pair in merges:
+        merged = pair[0] + pair[1]
+        words = {tuple(_merge_word(word, pair, merged)): count for word, count in words.items()}
+    return words
+
+
+def word_table(pretoken_counts: dict[bytes, int], merges: list[tuple[bytes, bytes]]):
+    byte_to_idx = {b: b for b in range(256)}
+    bytes_to_idx = {bytes([b]): b for b in range(256)}
+    words = WordTable.from_pretoken_counts(pretoken_counts, byte_to_idx)
+    # offsets never change, so the word owning each position is fixed; only words holding the left id are visited
+    word_of_position = np.repeat(np.arange(len(words)), np.diff(words.offsets))
+    for left, right in merges:
+        pair, new_idx = (bytes_to_idx[left], bytes_to_idx[right]), len(bytes_to_idx)
+        bytes_to_idx[left + right] = new_idx
+        for word_idx in np.unique(word_of_position[words.ids == pair[0]]).tolist():
+            words[word_idx] = _merge_word(words[word_idx], pair, new_idx)
+    return words
+
+
+def measure(build, pretoken_counts: dict[bytes, int], merges: list[tuple[bytes, bytes]]) -> dict:
+    build({b"ab": 1}, [(b"a", b"b")])  # keep lazy imports out of the measurement
+    tracemalloc.start()
+    start = time.perf_counter()
+    words = build(pretoken_counts, merges)
+    seconds = time.perf_counter() - start
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del words
+    return {"retained": retained, "peak": peak, "seconds": seconds}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--inputs", nargs="+", default=INPUTS)
+    parser.add_argument("--vocab-size", type=int, default=500)
+    args = parser.parse_args()
+
+    rows = []
+    for input_name in args.inputs:
+        pretoken_counts = count_pretokens(FIXTURES_PATH / input_name, SPECIAL_TOKENS)
+        trainer = BPETrainer(WordTable.from_pretoken_counts(pretoken_counts, {b: b for b in range(256)}),
+                             {b: bytes([b]) for b in range(256)})
+        trainer.train(args.vocab_size)
+        results = {name: measure(build, pretoken_counts, trainer.merges)
+                   for name, build in [("tuple of bytes", tuple_of_bytes), ("WordTable", word_table)]}
+        for name, result in results.items():
+            rows.append({
+                "input": input_name,
+                "words": len(pretoken_counts),
+                "merges": len(trainer.merges),
+                "representation": name,
+                "retained": fmt_bytes(result["retained"]),
+                "peak": fmt_bytes(result["peak"]),
+                "peak ratio": f"{result['peak'] / results['WordTable']['peak']:.1f}x",
+                "merge time": f"{result['seconds']:.2f} s",
+            })
+    print_table(rows, ["input", "words", "merges", "representation", "retained", "peak", "peak ratio", "merge time"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Instrumentation of BPE training runs.
+
+A `TrainingProfiler` passed to `train_bpe` records the wall time and peak RSS of every phase of the run
+(the RSS of worker processes included), samples merges per second and the sizes of the merge heap and
+pair index while merging, and writes it all out as a JSON report. With `progress`, a tqdm bar follows
+the merges.
+
+    profiler = TrainingProfiler(progress=True)
+    vocab, merges = train_bpe("data/owt_train.txt", 32000, ["<|endoftext|>"], profiler=profiler)
+    profiler.write_report("train_bpe_profile.json")
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+import psutil
+from tqdm import tqdm
+
+DEFAULT_SAMPLE_EVERY = 100
+# seconds between two RSS readings of the background sampler
+DEFAULT_RSS_INTERVAL = 0.05
+
+
+class TrainingProfiler:
+    def __init__(
+        self, progress: bool = False, sample_every: int = DEFAULT_SAMPLE_EVERY, rss_interval: float = DEFAULT_RSS_INTERVAL
+    ):
+        """
+        Args:
+            progress (bool): show a tqdm progress bar of the merges.
+            sample_every (int): merges between two samples of the merge rate and the heap and index sizes.
+            rss_interval (float): seconds between two RSS readings while a phase is running.
+        """
+        self.progress = progress
+        self.sample_every = sample_every
+        self.rss_interval = rss_interval
+        self.phases: list[dict] = []
+        self.samples: list[dict] = []
+        self.stats: dict = dict()
+        self.peak_rss_bytes = 0
+        self._process = psutil.Process()
+        self._start = time.perf_counter()
+        self._open_phases: list[dict] = []
+        self._sampler: threading.Thread | None = None
+        self._stop_sampler = threading.Event()
+        self._bar = None
+
+    def rss_bytes(self) -> int:
+        """Resident set size of this process and all of its children."""
+        rss = self._process.memory_info().rss
+        for child in self._process.children(recursive=True):
+            try:
+                rss += child.memory_info().rss
+            except psutil.NoSuchProcess:  # exited since it was listed
+                pass
+        return rss
+
+    def _record_rss(self) -> int:
+        rss = self.rss_bytes()
+        self.peak_rss_bytes = max(self.peak_rss_bytes, rss)
+        for phase in self._open_phases:
+            phase["peak_rss_bytes"] = max(phase["peak_rss_bytes"], rss)
+        return rss
+
+    def _sample_rss(self):
+        while not self._stop_sampler.wait(self.rss_interval):
+            self._record_rss()
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """
+        Time the enclosed block as phase `name`. Phases may be nested; an inner phase is also counted in the
+        outer one. RSS is read in a background thread for as long as a phase is open.
+        """
+        phase = {"name": name, "seconds": 0.0, "peak_rss_bytes": 0, "rss_bytes": 0}
+        self._open_phases.append(phase)
+        self._record_rss()
+        if self._sampler is None:
+            self._stop_sampler.clear()
+            self._sampler = threading.Thread(target=self._sample_rss, daemon=True)
+            self._sampler.start()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            phase["seconds"] = time.perf_counter() - start
+            phase["rss_bytes"] = self._record_rss()
+            self._open_phases.remove(phase)
+            if not self._open_phases:
+                self._stop_sampler.set()
+                self._sampler.join()
+                self._sampler = None
+            self.phases.append(phase)
+
+    def record(self, **stats):
+        """Add named values, such as the number of chunks or distinct pretokens, to the report."""
+        self.stats.update(stats)
+
+    def start_merges(self, trainer, vocab_size: int):
+        """Called by `BPETrainer.train` before the first merge."""
+        self._merge_start = self._last_sample = time.perf_counter()
+        self._first_merge = self._last_sample_merges = len(trainer.merge_pairs)
+        if self.progress:
+            self._bar = tqdm(total=max(0, vocab_size - len(trainer.vocab)), unit="merge", desc="BPE merges")
+        self._sample(trainer)
+
+    def on_merge(self, trainer):
+        """Called by `BPETrainer.train` after every merge."""
+        if self._bar is not None:
+            self._bar.update()
+        if (len(trainer.merge_pairs) - self._first_merge) % self.sample_every == 0:
+            self._sample(trainer)
+
+    def end_merges(self, trainer):
+        """Called by `BPETrainer.train` after the last merge."""
+        if self._last_sample_merges != len(trainer.merge_pairs):
+            self._sample(trainer)
+        if self._bar is not None:
+            self._bar.close()
+            self._bar = None
+        seconds = time.perf_counter() - self._merge_start
+        merges = len(trainer.merge_pairs) - self._first_merge
+        self.stats["merges"] = {
+            "count": merges,
+            "seconds": seconds,
+            "merges_per_second": merges / seconds if seconds else 0.0,
+        }
+
+    def _sample(self, trainer):
+        now = time.perf_counter()
+        merges = len(trainer.merge_pairs)
+        elapsed = now - self._last_sample
+        sample = {
+            "merges": merges,
+            "elapsed_seconds": now - self._start,
+            # rate since the previous sample, so a slowdown late in training shows up
+            "merges_per_second": (merges - self._last_sample_merges) / elapsed if elapsed else 0.0,
+            "rss_bytes": self._record_rss(),
+        }
+        sample.update(trainer.index_sizes())
+        self.samples.append(sample)
+        self._last_sample, self._last_sample_merges = now, merges
+        if self._bar is not None:
+            self._bar.set_postfix(pairs=sample["pairs"], heap=sample["heap_entries"], refresh=False)
+
+    def report(self) -> dict:
+        return {
+            "total_seconds": time.perf_counter() - self._start,
+            "peak_rss_bytes": self.peak_rss_bytes,
+            "phases": self.phases,
+            "stats": self.stats,
+            "samples": self.samples,
+        }
+
+    def write_report(self, path: str | os.PathLike):
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2)
@@ -1,8 +1,31 @@
-from .tokenizer import Tokenizer, pretokenize
+from .pretokenizer import pretokenize
+from .special_tokens import SpecialTokenMatcher
+from .tokenizer import Tokenizer
+from array import array
+from collections import OrderedDict, deque
 from dataclasses import dataclass
-import regex as re
-from typing import Iterable, Iterator
+from functools import cached_property
+import codecs
+import hashlib
+import heapq
+from itertools import repeat
+import numpy as np
+from typing import BinaryIO, Iterable, Iterator, NamedTuple, TextIO
 import json
+import os
+
+# array typecodes matching the numpy dtypes token ids are stored in
+_ARRAY_TYPECODES = {np.dtype(np.uint16): "H", np.dtype(np.uint32): "I"}
+# (rank, merged index) of a pair without a merge; sorts after every real one
+_NO_MERGE = (float("inf"), -1)
+# whether the bytes of a vocab entry merge back into that entry, see `BPETokenizer._encode_bytes`
+_UNCHECKED, _MERGES_TO_ITSELF, _SPLITS = 0, 1, 2
+
+
+def token_dtype(vocab_size: int) -> np.dtype:
+    """Smallest unsigned dtype that can hold every token id of a vocab with `vocab_size` entries."""
+    return np.dtype(np.uint16) if vocab_size <= 1 << 16 else np.dtype(np.uint32)
+
 
 @dataclass(frozen=True)
 class BPETokenizerParams:
@@ -10,33 +33,111 @@ class BPETokenizerParams:
     vocab: dict[int, bytes] # index -> bytes
     merges: list[tuple[bytes, bytes]]
     special_tokens: list[str] | None
+
+
+class PretokenCacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    size: int
+    max_size: int
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+
+class IncrementalDecoder:
+    """
+    Decode token ids as they are generated. Each call only looks at the new tokens, and bytes
+    of a UTF-8 character that is not complete yet are held back until the rest arrives.
+    """
+    def __init__(self, vocab: dict[int, bytes]):
+        self.vocab = vocab
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+    def feed(self, tokens: int | Iterable[int]) -> str:
+        """Add one or more token ids and return the text they complete."""
+        if isinstance(tokens, int):
+            return self._decoder.decode(self.vocab[tokens])
+        return self._decoder.decode(b"".join(self.vocab[token] for token in tokens))
+
+    def flush(self) -> str:
+        """Return whatever is still held back (as replacement characters) and reset the decoder."""
+        text = self._decoder.decode(b"", final=True)
+        self._decoder.reset()
+        return text
+
+    def reset(self):
+        self._decoder.reset()
+
     
 class BPETokenizer(Tokenizer):
-    def __init__(self, params: BPETokenizerParams):
+    # pretokens longer than this are merged with a heap instead of rescanning all pairs per merge
+    HEAP_MERGE_THRESHOLD = 16
+    DEFAULT_CACHE_SIZE = 16384
+    DEFAULT_STREAM_BUFFER_SIZE = 1 << 16
+    DEFAULT_ARRAY_CHUNK_TOKENS = 1 << 20
+
+    def __init__(self, params: BPETokenizerParams, cache_size: int = DEFAULT_CACHE_SIZE):
+        """
+        Args:
+            params (BPETokenizerParams): vocab, merges and special tokens.
+            cache_size (int): max number of pretokens whose token ids are kept in an LRU cache. 0 disables caching.
+        """
         self.vocab = params.vocab
-        self.special_tokens = params.special_tokens
         self.special_token_to_idx = dict()
-        self.special_tokens_regex = None
-        if self.special_tokens:
-            self._init_special_tokens()
+        if params.special_tokens:
+            self._init_special_tokens(params.special_tokens)
         self.bytes_to_idx = {bs : idx for idx, bs in self.vocab.items()}
+        self.byte_to_idx = {bs[0] : idx for bs, idx in self.bytes_to_idx.items() if len(bs) == 1}
         self._init_merges(params.merges)
+        self._init_runtime(params.special_tokens, cache_size)
+
+    def _init_runtime(self, special_tokens: list[str] | None, cache_size: int):
+        """
+        Everything besides the vocab, merge and special token tables. Every way of building a tokenizer
+        calls this once those tables are set.
+        """
+        self.special_tokens = special_tokens
+        self.special_token_matcher = SpecialTokenMatcher(special_tokens) if special_tokens else None
+        self._init_cache(cache_size)
+        self._init_whole_tokens()
+        self._pool = None
+
+    def _init_whole_tokens(self):
+        self._whole_tokens = bytearray(max(self.vocab) + 1)
+
+    def _init_cache(self, cache_size: int):
+        self.cache_size = cache_size
+        self._cache: OrderedDict[str, tuple[int, ...]] | None = OrderedDict() if cache_size > 0 else None
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_evictions = 0
+
+    def __getstate__(self):
+        # ship an empty pretoken cache to worker processes
+        state = self.__dict__.copy()
+        if self._cache is not None:
+            state["_cache"] = OrderedDict()
+        state["_pool"] = None
+        return state
         
     def _init_merges(self, merges: list[tuple[bytes, bytes]]):
         self.merges_idx: list[tuple[tuple[int, int], int]] = []
+        # pair -> (rank, merged index); the first occurrence of a pair wins, as in the sequential merge loop
+        self.merge_ranks: dict[tuple[int, int], tuple[int, int]] = dict()
         for b1, b2 in merges:
             idx1, idx2 = self.bytes_to_idx[b1], self.bytes_to_idx[b2]
             merge_idx = self.bytes_to_idx[b1 + b2]
             self.merges_idx.append(((idx1, idx2), merge_idx))
+            self.merge_ranks.setdefault((idx1, idx2), (len(self.merges_idx) - 1, merge_idx))
 
-    def _init_special_tokens(self):
-        # initialize special token regex
-        escaped_tokens = [re.escape(st) for st in self.special_tokens]
-        escaped_tokens.sort(key = len, reverse = True)
-        self.special_tokens_regex = "(" + "|".join(escaped_tokens) + ")"
-        
+    def _init_special_tokens(self, special_tokens: list[str]):
         # add new special tokens
-        special_tokens_set = set(self.special_tokens)
+        special_tokens_set = set(special_tokens)
         bytes_special_tokens_set = set({s.encode("utf-8") for s in special_tokens_set})
         in_vocab_special_tokens = set({t for t in self.vocab.values()if t in bytes_special_tokens_set})
         in_vocab_special_tokens = set({bs.decode("utf-8") for bs in in_vocab_special_tokens})
@@ -53,7 +154,8 @@ class BPETokenizer(Tokenizer):
                 self.special_token_to_idx[string] = token
 
     @classmethod
-    def from_files(cls, vocab_filepath: str, merges_filepath: str, special_tokens: list[str] | None = None):
+    def from_files(cls, vocab_filepath: str, merges_filepath: str, special_tokens: list[str] | None = None,
+                   cache_size: int = DEFAULT_CACHE_SIZE):
         vocab = dict()
         merges = []
         with open(vocab_filepath, mode="r") as f:
@@ -66,49 +168,367 @@ class BPETokenizer(Tokenizer):
                 if cleaned_line and len(cleaned_line.split(" ")) == 2:
                     merges.append(tuple([s.encode("utf-8") for s in cleaned_line.split(" ")]))
         params = BPETokenizerParams(vocab, merges, special_tokens)
-        tokenizer = BPETokenizer(params)
+        tokenizer = BPETokenizer(params, cache_size=cache_size)
         return tokenizer
         
-    def encode(self, string: str) -> list[int]:
-        splitted = re.split(self.special_tokens_regex, string) if self.special_tokens else [string]
+    def save_binary(self, path: str | os.PathLike):
+        """Write the tokenizer in the memory-mappable format read by `CompactBPETokenizer.load_binary`."""
+        from .compact_bpe_tokenizer import save_binary
+        save_binary(self, path)
+
+    def encode(self, string: str, max_tokens: int | None = None) -> list[int]:
+        """
+        Args:
+            string (str): input string
+            max_tokens (int | None): if given, return only the first `max_tokens` ids. Tokenization
+                stops once they are known, so the rest of `string` is never pretokenized or merged.
+        """
+        if max_tokens is not None:
+            return self._encode_limited(string, max_tokens)
         indices = []
-        for chunk in splitted:
-            if not chunk:
-                continue
-            if chunk in self.special_token_to_idx:
-                indices.append(self.special_token_to_idx[chunk])
-            else:
-                pretokens = pretokenize(chunk)
-                for pretoken in pretokens:
-                    if not pretoken:
-                        continue
-                    bs = pretoken.encode("utf-8")
-                    bs_list = [bs[i:i+1] for i in range(len(bs))]
-                    idxs = [self.bytes_to_idx[b] for b in bs_list]
-                    for pair, new_idx in self.merges_idx:
-                        idxs = self._merge(idxs, pair, new_idx)
-                    indices.extend(idxs)
+        self._encode_into(string, indices)
+        return indices
+
+    def count_tokens(self, string: str) -> int:
+        """`len(encode(string))`, without building the list of ids."""
+        return sum(map(len, self._token_groups(string)))
+
+    def truncate(self, string: str, max_tokens: int) -> str:
+        """
+        The prefix of `string` covered by its first `max_tokens` tokens, i.e. `string` itself if it fits.
+        A character whose UTF-8 bytes are only partly covered is dropped.
+        """
+        tokens = self._encode_limited(string, max_tokens + 1)
+        if len(tokens) <= max_tokens:
+            return string
+        # without a final flush the decoder holds back a trailing partial character
+        return self.incremental_decoder().feed(tokens[:max_tokens])
+
+    def _encode_limited(self, string: str, max_tokens: int) -> list[int]:
+        if max_tokens < 0:
+            raise ValueError(f"max_tokens must be non-negative, got {max_tokens}")
+        indices = []
+        if max_tokens == 0:
+            return indices
+        for idxs in self._token_groups(string):
+            indices.extend(idxs)
+            if len(indices) >= max_tokens:
+                del indices[max_tokens:]
+                break
         return indices
+
+    def _token_groups(self, string: str) -> Iterator[tuple[int, ...]]:
+        """Lazily yield the ids of `string` one pretoken or special token at a time."""
+        pos = 0
+        if self.special_tokens:
+            for start, end, special_token in self.special_token_matcher.finditer(string):
+                yield from map(self._encode_pretoken, pretokenize(string[pos:start]))
+                yield (self.special_token_to_idx[special_token],)
+                pos = end
+        yield from map(self._encode_pretoken, pretokenize(string[pos:]))
+
+    def _encode_into(self, string: str, indices: list[int] | array):
+        pos = 0
+        if self.special_tokens:
+            for start, end, special_token in self.special_token_matcher.finditer(string):
+                self._encode_plain(string[pos:start], indices)
+                indices.append(self.special_token_to_idx[special_token])
+                pos = end
+        self._encode_plain(string[pos:], indices)
+
+    def _encode_plain(self, chunk: str, indices: list[int] | array):
+        cache = self._cache
+        if cache is None:
+            encode_bytes = self._encode_bytes
+            for pretoken in pretokenize(chunk):
+                indices.extend(encode_bytes(pretoken.encode("utf-8")))
+            return
+        # the cache hit path of `_encode_pretoken`, inlined since it is taken for most pretokens
+        get, move_to_end, encode_pretoken = cache.get, cache.move_to_end, self._encode_pretoken
+        hits = 0
+        for pretoken in pretokenize(chunk):
+            idxs = get(pretoken)
+            if idxs is None:
+                idxs = encode_pretoken(pretoken)
+            else:
+                move_to_end(pretoken)
+                hits += 1
+            indices.extend(idxs)
+        self.cache_hits += hits
+
     def decode(self, tokens: list[int]) -> str:
         bytes_list = [self.vocab[token] for token in tokens]
         string = b"".join(bytes_list).decode("utf-8", errors='replace')
         return string
+
+    @cached_property
+    def fingerprint(self) -> str:
+        """
+        sha256 over the vocab, the merges and the special tokens: tokenizers with the same fingerprint
+        produce the same ids for every text, whatever their class or how they were loaded.
+        """
+        digest = hashlib.sha256()
+        for idx in sorted(self.vocab):
+            token = self.vocab[idx]
+            digest.update(array("q", [idx, len(token)]).tobytes())
+            digest.update(token)
+        digest.update(array("q", [x for (idx1, idx2), merge_idx in self.merges_idx for x in (idx1, idx2, merge_idx)]).tobytes())
+        digest.update(json.dumps(sorted(self.special_token_to_idx.items())).encode("utf-8"))
+        return digest.hexdigest()
+
+    @cached_property
+    def token_dtype(self) -> np.dtype:
+        """uint16 when every token id fits, uint32 otherwise."""
+        return token_dtype(max(self.vocab) + 1)
+
+    def _new_array(self) -> array:
+        return array(_ARRAY_TYPECODES[self.token_dtype])
+
+    def encode_to_array(self, string: str) -> np.ndarray:
+        """`encode`, but token ids are packed into a `token_dtype` array without building a list of ints."""
+        indices = self._new_array()
+        self._encode_into(string, indices)
+        return np.frombuffer(indices, dtype=self.token_dtype)
+
+    def encode_iterable_arrays(self, iterable: Iterable[str],
+                               chunk_tokens: int = DEFAULT_ARRAY_CHUNK_TOKENS) -> Iterator[np.ndarray]:
+        """
+        `encode_iterable`, but yields `token_dtype` arrays of at least `chunk_tokens` ids (except the last one).
+        Concatenated, they equal `encode_to_array("".join(iterable))`.
+        """
+        carry = ""
+        indices = self._new_array()
+        for string in iterable:
+            if not string:
+                continue
+            carry = self._encode_prefix(carry + string, indices)
+            if len(indices) >= chunk_tokens:
+                yield np.frombuffer(indices, dtype=self.token_dtype)
+                indices = self._new_array()
+        self._encode_into(carry, indices)
+        if indices:
+            yield np.frombuffer(indices, dtype=self.token_dtype)
+
+    @cached_property
+    def _decode_tables(self) -> tuple[np.ndarray, np.ndarray]:
+        """(blob, offsets) with token i at `blob[offsets[i]:offsets[i + 1]]`; ids missing from the vocab are empty."""
+        lengths = np.zeros(max(self.vocab) + 1, dtype=np.int64)
+        for idx, bs in self.vocab.items():
+            lengths[idx] = len(bs)
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        blob = np.frombuffer(b"".join(self.vocab.get(idx, b"") for idx in range(len(lengths))), dtype=np.uint8)
+        return blob, offsets
+
+    def decode_array(self, tokens: np.ndarray) -> str:
+        """Vectorized `decode`: token bytes are gathered from a flat blob through an offsets table."""
+        blob, offsets = self._decode_tables
+        tokens = np.asarray(tokens, dtype=np.int64)
+        starts = offsets[tokens]
+        lengths = offsets[tokens + 1] - starts
+        # output byte j of token k comes from blob[starts[k] + j]
+        out_starts = np.cumsum(lengths) - lengths
+        gather = np.arange(int(lengths.sum()), dtype=np.int64) + np.repeat(starts - out_starts, lengths)
+        return blob[gather].tobytes().decode("utf-8", errors="replace")
+
+    def start_pool(self, num_workers: int | None = None, **kwargs):
+        """
+        Start a persistent pool of worker processes, each with a copy of this tokenizer, used by
+        `encode_batch`/`decode_batch`. Keyword arguments are passed on to `TokenizerPool`.
+        """
+        from .tokenizer_pool import TokenizerPool
+        self.close_pool()
+        self._pool = TokenizerPool(self, num_workers, **kwargs)
+
+    def close_pool(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
+
+    def encode_batch(self, texts: list[str]) -> list[list[int]]:
+        """Encode many strings, in order. Runs in the worker pool if one was started, inline otherwise."""
+        if self._pool is None:
+            return [self.encode(text) for text in texts]
+        return self._pool.encode_batch(texts)
+
+    def decode_batch(self, batch: list[list[int]]) -> list[str]:
+        """Decode many token lists, in order. Runs in the worker pool if one was started, inline otherwise."""
+        if self._pool is None:
+            return [self.decode(tokens) for tokens in batch]
+        return self._pool.decode_batch(batch)
+
+    def incremental_decoder(self) -> IncrementalDecoder:
+        """Stateful decoder for streaming generated tokens, see `IncrementalDecoder`."""
+        return IncrementalDecoder(self.vocab)
     
     def encode_iterable(self, iterable: Iterable[str]) -> Iterator[int]:
+        """
+        Pretokens and special tokens may span element boundaries: the output always equals
+        `encode("".join(iterable))`, while only the unfinished tail of the text seen so far is kept.
+        """
+        carry = ""
+        indices = []
         for string in iterable:
-            tokens = self.encode(string)
-            for token in tokens:
-                yield token
-    
+            if not string:
+                continue
+            carry = self._encode_prefix(carry + string, indices)
+            yield from indices
+            indices.clear()
+        self._encode_into(carry, indices)
+        yield from indices
+
+    def encode_stream(self, stream: BinaryIO | TextIO, buffer_size: int = DEFAULT_STREAM_BUFFER_SIZE) -> Iterator[int]:
+        """
+        Lazily encode a file object by reading fixed-size buffers, regardless of its line lengths.
+        Binary streams are decoded as UTF-8, and characters split between buffers are carried over.
+        Peak memory is bounded by `buffer_size` plus the longest pretoken in the stream.
+        """
+        return self.encode_iterable(self._read_stream(stream, buffer_size))
+
     @staticmethod
-    def _merge(indices: list[int], pair: tuple[int, int], new_index: int) -> list[int]:
+    def _read_stream(stream: BinaryIO | TextIO, buffer_size: int) -> Iterator[str]:
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        while buffer := stream.read(buffer_size):
+            yield decoder.decode(buffer) if isinstance(buffer, bytes) else buffer
+        yield decoder.decode(b"", final=True)
+
+    def _encode_prefix(self, text: str, indices: list[int] | array) -> str:
+        """
+        Encode the longest prefix of `text` whose tokens cannot change whatever text follows,
+        appending them to `indices`, and return the rest of `text`.
+        """
+        # a suffix that might grow into a special token is never final
+        hold = len(text)
+        pos = 0
+        if self.special_tokens:
+            hold = self.special_token_matcher.partial_suffix_start(text)
+            for start, end, special_token in self.special_token_matcher.finditer(text):
+                if start >= hold:
+                    break
+                self._encode_plain(text[pos:start], indices)
+                indices.append(self.special_token_to_idx[special_token])
+                pos = end
+        # pretokens cover the text contiguously. The last two may still change (a contraction like
+        # "'ll" is cut as "'" and "l", whitespace depends on the next character), so keep them.
+        held = deque()
+        end = pos
+        for pretoken in pretokenize(text[pos:hold]):
+            held.append(pretoken)
+            if len(held) > 2:
+                pretoken = held.popleft()
+                indices.extend(self._encode_pretoken(pretoken))
+                end += len(pretoken)
+        return text[end:]
+    
+    def _encode_pretoken(self, pretoken: str) -> tuple[int, ...]:
+        cache = self._cache
+        if cache is not None:
+            idxs = cache.get(pretoken)
+            if idxs is not None:
+                cache.move_to_end(pretoken)
+                self.cache_hits += 1
+                return idxs
+            self.cache_misses += 1
+        idxs = self._encode_bytes(pretoken.encode("utf-8"))
+        if cache is not None:
+            cache[pretoken] = idxs
+            if len(cache) > self.cache_size:
+                cache.popitem(last=False)
+                self.cache_evictions += 1
+        return idxs
+
+    def _encode_bytes(self, pretoken: bytes) -> tuple[int, ...]:
+        """
+        Token ids of one pretoken. Most pretokens are a single vocab entry, and the bytes of an entry
+        learned by BPE almost always merge back into it. That is checked the first time an entry comes
+        up, after which the entry is returned without merging.
+        """
+        idx = self.bytes_to_idx.get(pretoken)
+        if idx is not None and self._whole_tokens[idx] == _MERGES_TO_ITSELF:
+            return (idx,)
+        idxs = tuple(self._bpe(list(map(self.byte_to_idx.__getitem__, pretoken))))
+        if idx is not None:
+            self._whole_tokens[idx] = _MERGES_TO_ITSELF if idxs == (idx,) else _SPLITS
+        return idxs
+
+    def cache_info(self) -> PretokenCacheInfo:
+        size = len(self._cache) if self._cache is not None else 0
+        return PretokenCacheInfo(self.cache_hits, self.cache_misses, self.cache_evictions, size, self.cache_size)
+
+    def cache_clear(self):
+        """Drop all cached pretokens and reset the counters."""
+        if self._cache is not None:
+            self._cache.clear()
+        self.cache_hits = self.cache_misses = self.cache_evictions = 0
+
+    def _bpe(self, idxs: list[int]) -> list[int]:
+        """
+        Merge a single pretoken by repeatedly applying the lowest-ranked adjacent pair, leftmost first.
+        A pair created by a merge only counts if its rank is above the merge's, which reproduces applying
+        `merges_idx` in order exactly, while touching only the merges that can fire.
+
+        The rank of every adjacent pair is kept in a list, so finding the next merge is a `min` and an
+        `index` over it, and a merge only looks up the two pairs it creates.
+        """
+        if len(idxs) > self.HEAP_MERGE_THRESHOLD:
+            return self._bpe_heap(idxs)
+        get = self.merge_ranks.get
+        # ranks[i] is (rank, merged index) of the pair idxs[i], idxs[i + 1]
+        ranks = list(map(get, zip(idxs, idxs[1:]), repeat(_NO_MERGE)))
+        while ranks:
+            best = min(ranks)
+            if best is _NO_MERGE:
+                break
+            rank, new_idx = best
+            i = ranks.index(best)
+            idxs[i] = new_idx
+            del idxs[i + 1]
+            del ranks[i]
+            if i:
+                ranked = get((idxs[i - 1], new_idx), _NO_MERGE)
+                ranks[i - 1] = ranked if ranked[0] > rank else _NO_MERGE
+            if i < len(ranks):
+                ranked = get((new_idx, idxs[i + 1]), _NO_MERGE)
+                ranks[i] = ranked if ranked[0] > rank else _NO_MERGE
+        return idxs
+
+    def _bpe_heap(self, idxs: list[int]) -> list[int]:
+        """Same as `_bpe`, but keeps candidate pairs in a heap over a linked list of tokens."""
+        merge_ranks = self.merge_ranks
+        n = len(idxs)
+        tokens = list(idxs)
+        nxt = list(range(1, n + 1))
+        prv = list(range(-1, n - 1))
+        # (rank, left position, left token, right token, merged index); ties pop left to right
+        heap = []
+        for i in range(n - 1):
+            ranked = merge_ranks.get((tokens[i], tokens[i + 1]))
+            if ranked is not None:
+                heap.append((ranked[0], i, tokens[i], tokens[i + 1], ranked[1]))
+        heapq.heapify(heap)
+        while heap:
+            rank, i, left, right, new_idx = heapq.heappop(heap)
+            j = nxt[i]
+            if tokens[i] != left or j >= n or tokens[j] != right:
+                continue
+            tokens[i] = new_idx
+            tokens[j] = -1
+            k = nxt[j]
+            nxt[i] = k
+            if k < n:
+                prv[k] = i
+            h = prv[i]
+            if h >= 0:
+                ranked = merge_ranks.get((tokens[h], new_idx))
+                if ranked is not None and ranked[0] > rank:
+                    heapq.heappush(heap, (ranked[0], h, tokens[h], new_idx, ranked[1]))
+            if k < n:
+                ranked = merge_ranks.get((new_idx, tokens[k]))
+                if ranked is not None and ranked[0] > rank:
+                    heapq.heappush(heap, (ranked[0], i, new_idx, tokens[k], ranked[1]))
         merged = []
         i = 0
-        while i < len(indices):
-            if i + 1 < len(indices) and (indices[i], indices[i+1]) == pair:
-                merged.append(new_index)
-                i += 2
-            else:
-                merged.append(indices[i])
-                i += 1
-        return merged
\ No newline at end of file
+        while i < n:
+            merged.append(tokens[i])
+            i = nxt[i]
+        return merged
@@ -0,0 +1,103 @@
+"""
+Splitting a large file into byte ranges that can be processed independently.
+
+The file is memory-mapped and cut at the start of a split token (usually a document separator such as
+"<|endoftext|>"). Boundaries start out evenly spaced and each one is moved to the nearest split token in
+either direction, so chunks stay close to equal size. Workers read their ranges back through the memory
+map as memoryviews, without copying them into a bytes object first.
+
+    spans = plan_chunks("data/owt_train.txt", [b"<|endoftext|>"], num_workers=8, chunks_per_worker=4)
+    for chunk in iter_chunks("data/owt_train.txt", spans[:4]):
+        text = str(chunk, "utf-8")
+"""
+import mmap
+import os
+from typing import BinaryIO, Iterator, Sequence
+
+DEFAULT_CHUNK_BYTES = 1 << 24
+
+
+def find_boundaries(buffer, num_chunks: int, split_tokens: Sequence[bytes]) -> list[int]:
+    """
+    Offsets splitting `buffer` (bytes, mmap or anything with `find` and `rfind`) into about `num_chunks`
+    ranges of similar size, each boundary at the start of an occurrence of one of `split_tokens`. The first
+    offset is 0 and the last is `len(buffer)`. Fewer chunks are returned when a stretch between two evenly
+    spaced guesses holds no split token.
+    """
+    size = len(buffer)
+    if size == 0:
+        return [0]
+    boundaries = [0]
+    for i in range(1, num_chunks):
+        target = size * i // num_chunks
+        next_target = size * (i + 1) // num_chunks
+        if target <= boundaries[-1]:
+            continue
+        # only the bytes between the previous boundary and the next guess are searched, so the whole plan
+        # reads every byte about twice whatever the number of chunks
+        found = [buffer.find(token, target, next_target + len(token) - 1) for token in split_tokens]
+        after = min((offset for offset in found if offset != -1), default=None)
+        found = [buffer.rfind(token, boundaries[-1] + 1, target + len(token) - 1) for token in split_tokens]
+        before = max(found, default=-1)
+        if before != -1 and (after is None or target - before < after - target):
+            boundaries.append(before)
+        elif after is not None:
+            boundaries.append(after)
+    boundaries.append(size)
+    return boundaries
+
+
+def find_file_boundaries(file: BinaryIO, num_chunks: int, split_tokens: Sequence[bytes]) -> list[int]:
+    """`find_boundaries` over the memory-mapped contents of an open binary file."""
+    if os.fstat(file.fileno()).st_size == 0:
+        return [0]
+    with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        return find_boundaries(buffer, num_chunks, split_tokens)
+
+
+def plan_chunks(
+    path: str | os.PathLike,
+    split_tokens: Sequence[bytes],
+    num_workers: int | None = None,
+    chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+    chunks_per_worker: int = 1,
+) -> list[tuple[int, int]]:
+    """
+    (start, end) byte ranges covering the file at `path`, split on `split_tokens`.
+
+    Args:
+        path (str | os.PathLike): file to split.
+        split_tokens (Sequence[bytes]): a range may start at any occurrence of any of them. Without split
+            tokens the whole file is a single range.
+        num_workers (int | None): number of workers the ranges are for. Defaults to the number of cpus.
+        chunk_bytes (int): target size of a range; the file is split into at least size / chunk_bytes ranges.
+        chunks_per_worker (int): split into at least this many ranges per worker, so workers that finish
+            early can take over the remaining ranges.
+    """
+    size = os.path.getsize(path)
+    if size == 0:
+        return []
+    if not split_tokens:
+        return [(0, size)]
+    num_workers = num_workers or os.cpu_count() or 1
+    num_chunks = max(num_workers * chunks_per_worker, -(-size // chunk_bytes))
+    with open(path, "rb") as f:
+        boundaries = find_file_boundaries(f, num_chunks, split_tokens)
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+
+def iter_chunks(path: str | os.PathLike, spans: Sequence[tuple[int, int]]) -> Iterator[memoryview]:
+    """
+    Yield the bytes of every (start, end) range of the file at `path` as a read-only memoryview into a
+    memory map of the file. A view is released when the next one is requested, so it must not be kept,
+    nor anything still exporting its buffer; decode or copy it instead.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            for _ in spans:
+                yield memoryview(b"")
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer, memoryview(buffer) as view:
+            for start, end in spans:
+                with view[start:end] as chunk:
+                    yield chunk
@@ -0,0 +1,348 @@
+from array import array
+from collections.abc import Mapping, Sequence
+import json
+import mmap
+import os
+import struct
+import sys
+from functools import cached_property
+from typing import Iterable, Iterator
+from zlib import crc32
+
+import numpy as np
+
+from .bpe_tokenizer import BPETokenizer, BPETokenizerParams, token_dtype
+
+_EMPTY = -1
+_HASH_MULTIPLIER = 0x9E3779B97F4A7C15  # 2**64 / golden ratio, for multiplicative hashing
+
+BINARY_MAGIC = b"BPETOK\x00\x00"
+BINARY_FORMAT_VERSION = 2
+# magic, version, hash table bits, num tokens, num merges, vocab blob length, special tokens json length
+_BINARY_HEADER = struct.Struct("<8sIIqqqq")
+
+
+class CompactVocab(Mapping[int, bytes]):
+    """
+    Vocab stored as a single bytes blob plus an offsets array: token i is `blob[offsets[i]:offsets[i + 1]]`.
+    Token ids must be dense, i.e. 0..n-1. Both buffers may also be memoryviews into a mapped file.
+    """
+    def __init__(self, blob: bytes | memoryview, offsets: array | memoryview):
+        self.blob = blob
+        self.offsets = offsets
+        self._view = memoryview(blob)
+
+    def __reduce__(self):
+        return CompactVocab, (bytes(self._view), array("q", memoryview(self.offsets).tobytes()))
+
+    @classmethod
+    def from_dict(cls, vocab: dict[int, bytes]) -> "CompactVocab":
+        if set(vocab) != set(range(len(vocab))):
+            raise ValueError("CompactVocab needs token ids 0..n-1")
+        offsets = array("q", [0])
+        for idx in range(len(vocab)):
+            offsets.append(offsets[-1] + len(vocab[idx]))
+        return cls(b"".join(vocab[idx] for idx in range(len(vocab))), offsets)
+
+    def __getitem__(self, idx: int) -> bytes:
+        if not 0 <= idx < len(self.offsets) - 1:
+            raise KeyError(idx)
+        return bytes(self._view[self.offsets[idx]:self.offsets[idx + 1]])
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(range(len(self)))
+
+    def join(self, tokens: Iterable[int]) -> bytes:
+        """Concatenated bytes of `tokens`, without building a bytes object per token."""
+        view, offsets = self._view, self.offsets
+        return b"".join([view[offsets[t]:offsets[t + 1]] for t in tokens])
+
+
+class PackedMerges(Sequence[tuple[tuple[int, int], int]]):
+    """Merges as one flat int array of (left, right, merged) triples, viewed like `BPETokenizer.merges_idx`."""
+    def __init__(self, packed: array | memoryview):
+        self.packed = packed
+
+    def __getitem__(self, rank: int) -> tuple[tuple[int, int], int]:
+        if not 0 <= rank < len(self):
+            raise IndexError(rank)
+        left, right, merged = self.packed[3 * rank:3 * rank + 3]
+        return (left, right), merged
+
+    def __len__(self) -> int:
+        return len(self.packed) // 3
+
+
+class PairRankTable:
+    """
+    pair -> (rank, merged index) lookups, like `BPETokenizer.merge_ranks`, backed by an open-addressing
+    hash table over packed int arrays instead of a dict of tuples.
+    """
+    def __init__(self, packed_merges: array | memoryview, keys: array | memoryview | None = None,
+                 ranks: array | memoryview | None = None):
+        """`keys` and `ranks` are the slots of an already built table, e.g. mapped from a binary file."""
+        self.merges = PackedMerges(packed_merges)
+        if keys is not None:
+            self._keys, self._ranks = keys, ranks
+            self.bits = len(keys).bit_length() - 1
+            self._shift = 64 - self.bits
+            self._mask = len(keys) - 1
+            return
+        self.bits = max(3, (2 * len(self.merges)).bit_length())  # load factor <= 0.5
+        self._shift = 64 - self.bits
+        self._mask = (1 << self.bits) - 1
+        self._keys = array("q", [_EMPTY]) * (1 << self.bits)
+        self._ranks = array("i", [0]) * (1 << self.bits)
+        keys, ranks = self._keys, self._ranks
+        for rank in range(len(self.merges)):
+            left, right = packed_merges[3 * rank], packed_merges[3 * rank + 1]
+            slot = self._slot(left << 32 | right)
+            # the first occurrence of a pair wins, as in the sequential merge loop
+            if keys[slot] == _EMPTY:
+                keys[slot] = left << 32 | right
+                ranks[slot] = rank
+
+    def __reduce__(self):
+        views = [memoryview(b) for b in (self.merges.packed, self._keys, self._ranks)]
+        return PairRankTable, tuple(array(view.format, view.tobytes()) for view in views)
+
+    @classmethod
+    def from_merges(cls, merges_idx: Iterable[tuple[tuple[int, int], int]]) -> "PairRankTable":
+        packed = array("i")
+        for (left, right), merged in merges_idx:
+            packed.extend((left, right, merged))
+        return cls(packed)
+
+    def _slot(self, key: int) -> int:
+        keys, mask = self._keys, self._mask
+        slot = ((key * _HASH_MULTIPLIER) & 0xFFFFFFFFFFFFFFFF) >> self._shift
+        while keys[slot] != _EMPTY and keys[slot] != key:
+            slot = (slot + 1) & mask
+        return slot
+
+    def get(self, pair: tuple[int, int], default=None) -> tuple[int, int] | None:
+        key = pair[0] << 32 | pair[1]
+        slot = self._slot(key)
+        if self._keys[slot] == _EMPTY:
+            return default
+        rank = self._ranks[slot]
+        return rank, self.merges.packed[3 * rank + 2]
+
+    def __len__(self) -> int:
+        return len(self.merges)
+
+
+class TokenIdTable:
+    """
+    bytes -> token id lookups over a `CompactVocab`, like `BPETokenizer.bytes_to_idx`, backed by an
+    open-addressing hash table of ids. Tokens are hashed with crc32, which is stable across processes,
+    so the slots can be saved and mapped again.
+    """
+    def __init__(self, vocab: CompactVocab, slots: array | memoryview | None = None):
+        """`slots` are those of an already built table, e.g. mapped from a binary file."""
+        self.vocab = vocab
+        if slots is None:
+            slots = array("i", [_EMPTY]) * (1 << self.num_bits(len(vocab)))
+        self.slots = slots
+        self._mask = len(slots) - 1
+        self._blob, self._offsets = vocab.blob, vocab.offsets
+
+    @staticmethod
+    def num_bits(num_tokens: int) -> int:
+        return max(3, (2 * num_tokens).bit_length())  # load factor <= 0.5
+
+    @classmethod
+    def from_vocab(cls, vocab: CompactVocab) -> "TokenIdTable":
+        table = cls(vocab)
+        blob, offsets = vocab.blob, vocab.offsets
+        for idx in range(len(vocab)):
+            # a later id with the same bytes wins, as in `BPETokenizer.bytes_to_idx`
+            table.slots[table._slot(blob[offsets[idx]:offsets[idx + 1]])] = idx
+        return table
+
+    def __reduce__(self):
+        view = memoryview(self.slots)
+        return TokenIdTable, (self.vocab, array(view.format, view.tobytes()))
+
+    def _slot(self, token: bytes | memoryview) -> int:
+        slots, mask, blob, offsets = self.slots, self._mask, self._blob, self._offsets
+        slot = crc32(token) & mask
+        while (idx := slots[slot]) != _EMPTY and blob[offsets[idx]:offsets[idx + 1]] != token:
+            slot = (slot + 1) & mask
+        return slot
+
+    def get(self, token: bytes) -> int | None:
+        # the probe of `_slot`, inlined: this runs once per pretoken
+        slots, mask, blob, offsets = self.slots, self._mask, self._blob, self._offsets
+        slot = crc32(token) & mask
+        while (idx := slots[slot]) != _EMPTY:
+            if blob[offsets[idx]:offsets[idx + 1]] == token:
+                return idx
+            slot = (slot + 1) & mask
+        return None
+
+    def __getitem__(self, token: bytes) -> int:
+        idx = self.get(token)
+        if idx is None:
+            raise KeyError(token)
+        return idx
+
+
+class CompactBPETokenizer(BPETokenizer):
+    """
+    `BPETokenizer` with array-backed tables: the vocab is a `CompactVocab`, `bytes_to_idx` is a
+    `TokenIdTable` over it, and merges are packed into one int array and looked up through a
+    `PairRankTable`. The tables are built straight from the params, without the dicts of `BPETokenizer`.
+    `encode`/`decode` behave exactly like `BPETokenizer`.
+    """
+    def __init__(self, params: BPETokenizerParams, cache_size: int = BPETokenizer.DEFAULT_CACHE_SIZE):
+        self.vocab = params.vocab
+        self.special_token_to_idx = dict()
+        if params.special_tokens:
+            self._init_special_tokens(params.special_tokens)
+        self.vocab = CompactVocab.from_dict(self.vocab)
+        self.bytes_to_idx = bytes_to_idx = TokenIdTable.from_vocab(self.vocab)
+        self.byte_to_idx = {b: idx for b in range(256) if (idx := bytes_to_idx.get(bytes([b]))) is not None}
+        self.merge_ranks = PairRankTable.from_merges(
+            ((bytes_to_idx[b1], bytes_to_idx[b2]), bytes_to_idx[b1 + b2]) for b1, b2 in params.merges
+        )
+        self.merges_idx = self.merge_ranks.merges
+        self.binary_path = None
+        self._init_runtime(params.special_tokens, cache_size)
+
+    @classmethod
+    def load_binary(cls, path: str | os.PathLike, cache_size: int = BPETokenizer.DEFAULT_CACHE_SIZE) -> "CompactBPETokenizer":
+        """
+        Memory-map a tokenizer written by `save_binary`. Tables are used in place, straight from the
+        page cache, so nothing is built per vocab entry or merge; processes loading the same file
+        share its pages.
+        """
+        if sys.byteorder != "little":
+            raise ValueError("binary tokenizer files are little-endian")
+        with open(path, "rb") as f:
+            view = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        magic, version, bits, num_tokens, num_merges, blob_len, specials_len = _BINARY_HEADER.unpack_from(view)
+        if magic != BINARY_MAGIC:
+            raise ValueError(f"{path} is not a binary tokenizer file")
+        if version != BINARY_FORMAT_VERSION:
+            raise ValueError(f"unsupported binary tokenizer version {version}, expected {BINARY_FORMAT_VERSION}")
+        pos = _BINARY_HEADER.size
+
+        def section(nbytes: int) -> memoryview:
+            nonlocal pos
+            start, pos = pos, pos + _padded(nbytes)
+            return view[start:start + nbytes]
+
+        offsets = section(8 * (num_tokens + 1)).cast("q")
+        byte_to_idx = section(4 * 256).cast("i")
+        packed_merges = section(4 * 3 * num_merges).cast("i")
+        keys = section(8 << bits).cast("q")
+        ranks = section(4 << bits).cast("i")
+        token_slots = section(4 << TokenIdTable.num_bits(num_tokens)).cast("i")
+        blob = section(blob_len)
+        specials = json.loads(bytes(section(specials_len)))
+
+        tokenizer = cls.__new__(cls)
+        tokenizer.vocab = CompactVocab(blob, offsets)
+        tokenizer.bytes_to_idx = TokenIdTable(tokenizer.vocab, token_slots)
+        tokenizer.special_token_to_idx = specials["special_token_to_idx"]
+        tokenizer.byte_to_idx = {b: idx for b, idx in enumerate(byte_to_idx) if idx != _EMPTY}
+        tokenizer.merge_ranks = PairRankTable(packed_merges, keys, ranks)
+        tokenizer.merges_idx = tokenizer.merge_ranks.merges
+        tokenizer.binary_path = os.fspath(path)
+        tokenizer._init_runtime(specials["special_tokens"], cache_size)
+        return tokenizer
+
+    def __getstate__(self):
+        # a mapped tokenizer is re-mapped on the other side instead of copying its tables
+        if self.binary_path is not None:
+            return {"binary_path": self.binary_path, "cache_size": self.cache_size}
+        return super().__getstate__()
+
+    def __setstate__(self, state: dict):
+        if state.keys() == {"binary_path", "cache_size"}:
+            state = vars(self.load_binary(state["binary_path"], state["cache_size"]))
+        self.__dict__.update(state)
+
+    def _init_whole_tokens(self):
+        self._whole_tokens = bytearray(len(self.vocab))
+
+    def decode(self, tokens: list[int]) -> str:
+        return self.vocab.join(tokens).decode("utf-8", errors="replace")
+
+    @cached_property
+    def token_dtype(self) -> np.dtype:
+        return token_dtype(len(self.vocab))
+
+    @cached_property
+    def _decode_tables(self) -> tuple[np.ndarray, np.ndarray]:
+        # the vocab already is a blob plus offsets, so decode_array reads it in place
+        return np.frombuffer(self.vocab.blob, dtype=np.uint8), np.frombuffer(self.vocab.offsets, dtype=np.int64)
+
+
+def _padded(nbytes: int) -> int:
+    return -(-nbytes // 8) * 8
+
+
+def save_binary(tokenizer: BPETokenizer, path: str | os.PathLike):
+    """
+    Write `tokenizer` in a versioned, memory-mappable format:
+    a header followed by 8-byte aligned sections for the vocab offsets, the byte -> index table,
+    the packed merges, the pair -> rank hash table slots, the bytes -> index hash table slots, the vocab
+    blob and the special tokens (json).
+    """
+    if isinstance(tokenizer, CompactBPETokenizer):
+        vocab, token_ids = tokenizer.vocab, tokenizer.bytes_to_idx
+    else:
+        vocab = CompactVocab.from_dict(tokenizer.vocab)
+        token_ids = TokenIdTable.from_vocab(vocab)
+    table = tokenizer.merge_ranks
+    if not isinstance(table, PairRankTable):
+        table = PairRankTable.from_merges(tokenizer.merges_idx)
+    byte_to_idx = array("i", [tokenizer.byte_to_idx.get(b, _EMPTY) for b in range(256)])
+    specials = json.dumps({
+        "special_tokens": tokenizer.special_tokens,
+        "special_token_to_idx": tokenizer.special_token_to_idx,
+    }).encode("utf-8")
+    sections = [
+        vocab.offsets, byte_to_idx, table.merges.packed, table._keys, table._ranks, token_ids.slots, vocab.blob,
+        specials,
+    ]
+    with open(path, "wb") as f:
+        f.write(_BINARY_HEADER.pack(
+            BINARY_MAGIC, BINARY_FORMAT_VERSION, table.bits, len(vocab), len(table.merges),
+            memoryview(vocab.blob).nbytes, len(specials),
+        ))
+        for buffer in sections:
+            nbytes = memoryview(buffer).nbytes
+            f.write(buffer)
+            f.write(b"\x00" * (_padded(nbytes) - nbytes))
+
+
+def deep_sizeof(obj, seen: set[int] | None = None) -> int:
+    """Approximate memory held by `obj` and everything reachable from it, counting shared objects once."""
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    elif isinstance(obj, memoryview):
+        size += deep_sizeof(obj.obj, seen)
+    elif hasattr(obj, "__dict__") and not isinstance(obj, type):
+        size += deep_sizeof(vars(obj), seen)
+    return size
+
+
+def memory_footprint(tokenizer: BPETokenizer) -> dict[str, int]:
+    """Approximate bytes held by each attribute of `tokenizer`, plus a "total" entry."""
+    seen = set()
+    footprint = {name: deep_sizeof(value, seen) for name, value in vars(tokenizer).items()}
+    footprint["total"] = sum(footprint.values())
+    return footprint
@@ -0,0 +1,98 @@
+"""
+Pretoken counting in bounded memory.
+
+A `SpillingCounter` writes its counts to a run file, sorted by pretoken, whenever it holds more entries
+than its budget allows, and starts over empty. `merge_runs` k-way merges run files into a single sorted
+stream of (pretoken, count) with the counts of equal pretokens added up, so no more than one record per
+run is in memory at a time.
+"""
+import heapq
+import os
+import struct
+import tempfile
+from collections import Counter
+from itertools import groupby
+from operator import itemgetter
+from typing import Iterable, Iterator
+
+# a run file is a sequence of records: this header, then the UTF-8 bytes of the pretoken
+_RECORD = struct.Struct("<IQ")  # pretoken length, count
+# rough size in memory of one counter entry: the str key, the int count and the dict slot
+ENTRY_BYTES = 128
+READ_BUFFER_BYTES = 1 << 20
+# at most this many runs are open at once; more are first merged into intermediate runs
+MAX_MERGE_FANIN = 128
+
+
+class SpillingCounter:
+    def __init__(self, spill_dir: str | os.PathLike, max_entries: int):
+        """
+        Args:
+            spill_dir (str | os.PathLike): directory the run files are written to.
+            max_entries (int): the counts are spilled once they hold more distinct pretokens than this,
+                checked after every `update`.
+        """
+        self.spill_dir = spill_dir
+        self.max_entries = max_entries
+        self.counts = Counter()
+        self.runs: list[str] = []
+
+    def update(self, pretokens: Iterable[str]):
+        self.counts.update(pretokens)
+        if len(self.counts) > self.max_entries:
+            self.spill()
+
+    def spill(self):
+        """Write the current counts to a new run file and clear them."""
+        if self.counts:
+            records = sorted((pretoken.encode("utf-8"), count) for pretoken, count in self.counts.items())
+            self.runs.append(write_run(records, self.spill_dir))
+            self.counts = Counter()
+
+
+def write_run(records: Iterable[tuple[bytes, int]], spill_dir: str | os.PathLike) -> str:
+    """Write (pretoken, count) records, which must be sorted by pretoken, to a new run file and return its path."""
+    fd, path = tempfile.mkstemp(dir=spill_dir, suffix=".run")
+    with os.fdopen(fd, "wb", buffering=READ_BUFFER_BYTES) as f:
+        for pretoken, count in records:
+            f.write(_RECORD.pack(len(pretoken), count))
+            f.write(pretoken)
+    return path
+
+
+def read_run(path: str | os.PathLike) -> Iterator[tuple[bytes, int]]:
+    with open(path, "rb", buffering=READ_BUFFER_BYTES) as f:
+        while header := f.read(_RECORD.size):
+            length, count = _RECORD.unpack(header)
+            yield f.read(length), count
+
+
+def _merge_sorted(runs: list[Iterator[tuple[bytes, int]]]) -> Iterator[tuple[bytes, int]]:
+    for pretoken, records in groupby(heapq.merge(*runs, key=itemgetter(0)), key=itemgetter(0)):
+        yield pretoken, sum(count for _, count in records)
+
+
+def merge_runs(paths: list[str], min_count: int = 1, delete: bool = False) -> Iterator[tuple[bytes, int]]:
+    """
+    Yield (pretoken, total count) over all run files in `paths`, in pretoken order, leaving out pretokens
+    seen fewer than `min_count` times in total. With `delete`, the run files are removed once read.
+    """
+    paths = list(paths)
+    spill_dir = os.path.dirname(paths[0]) if paths else None
+    intermediate = set()
+    while len(paths) > MAX_MERGE_FANIN:
+        group, paths = paths[:MAX_MERGE_FANIN], paths[MAX_MERGE_FANIN:]
+        path = write_run(_merge_sorted([read_run(p) for p in group]), spill_dir)
+        intermediate.add(path)
+        paths.append(path)
+        for p in group:
+            if delete or p in intermediate:
+                os.unlink(p)
+    try:
+        for pretoken, count in _merge_sorted([read_run(p) for p in paths]):
+            if count >= min_count:
+                yield pretoken, count
+    finally:
+        for p in paths:
+            if delete or p in intermediate:
+                os.unlink(p)
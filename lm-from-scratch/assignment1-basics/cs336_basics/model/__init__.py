@@ -0,0 +1,4 @@
+from .attention import MultiHeadSelfAttention, RotaryPositionalEmbedding, scaled_dot_product_attention
+from .decoding import KVCache, LayerKVCache, sample_token
+from .layers import Embedding, Linear, RMSNorm, SwiGLU, silu, softmax
+from .transformer import TransformerBlock, TransformerLM
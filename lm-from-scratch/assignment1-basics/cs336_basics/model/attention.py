@@ -0,0 +1,166 @@
+"""
+Causal multi-head self-attention with rotary position embeddings.
+"""
+import math
+
+import torch
+from jaxtyping import Bool, Float, Int
+from torch import Tensor, nn
+
+from .decoding import LayerKVCache
+from .layers import Linear, softmax
+
+
+def scaled_dot_product_attention(
+    q: Float[Tensor, " ... queries d_k"],
+    k: Float[Tensor, " ... keys d_k"],
+    v: Float[Tensor, " ... keys d_v"],
+    mask: Bool[Tensor, " ... queries keys"] | None = None,
+) -> Float[Tensor, " ... queries d_v"]:
+    """softmax(q k^T / sqrt(d_k)) v, where a query only attends to the keys `mask` is True for."""
+    scores = q @ k.transpose(-2, -1) / math.sqrt(q.shape[-1])
+    if mask is not None:
+        scores = scores.masked_fill(~mask, float("-inf"))
+    return softmax(scores, dim=-1) @ v
+
+
+class RotaryPositionalEmbedding(nn.Module):
+    """
+    Rotates adjacent pairs of dimensions by angles proportional to the token position. The cos and sin
+    tables are non-persistent buffers, so they follow the module through `.to()` without entering the
+    state dict, and a model shares them by sharing the module between its layers. They are extended when
+    a sequence runs past `max_seq_len`.
+    """
+    def __init__(
+        self,
+        theta: float,
+        d_k: int,
+        max_seq_len: int,
+        device: torch.device | None = None,
+        dtype: torch.dtype | None = None,
+    ):
+        """
+        Args:
+            theta (float): base of the rotation frequencies.
+            d_k (int): size of the query and key vectors; rotated in pairs of adjacent dimensions.
+            max_seq_len (int): number of positions whose rotations are built up front.
+            device (torch.device | None): device to build the tables on.
+            dtype (torch.dtype | None): dtype of the tables, float32 by default.
+        """
+        super().__init__()
+        self.theta = theta
+        self.d_k = d_k
+        self.max_seq_len = max_seq_len
+        cos, sin = self._build_tables(max_seq_len, device, dtype or torch.float32)
+        self.register_buffer("cos", cos, persistent=False)
+        self.register_buffer("sin", sin, persistent=False)
+
+    def _build_tables(
+        self, seq_len: int, device: torch.device | None, dtype: torch.dtype
+    ) -> tuple[Float[Tensor, " positions half_d_k"], Float[Tensor, " positions half_d_k"]]:
+        # tables first built while generating are used in training too, and inference tensors cannot be
+        # saved for backward
+        with torch.inference_mode(False):
+            inv_freq = self.theta ** -(torch.arange(0, self.d_k, 2, device=device, dtype=torch.float32) / self.d_k)
+            angles = torch.outer(torch.arange(seq_len, device=device, dtype=torch.float32), inv_freq)
+            return angles.cos().to(dtype), angles.sin().to(dtype)
+
+    def _extend(self, seq_len: int):
+        """Make the tables cover positions up to `seq_len - 1`, growing them to at least twice their length."""
+        if seq_len > len(self.cos):
+            self.cos, self.sin = self._build_tables(max(seq_len, 2 * len(self.cos)), self.cos.device, self.cos.dtype)
+
+    def forward(
+        self,
+        x: Float[Tensor, " ... seq d_k"],
+        token_positions: Int[Tensor, " ... seq"] | None = None,
+        offset: int = 0,
+        max_position: int | None = None,
+    ) -> Float[Tensor, " ... seq d_k"]:
+        """
+        `offset` is the number of tokens before `x` in the sequence. Without `token_positions` the tokens
+        are at positions `offset`, `offset + 1`, ..., and the tables are sliced rather than gathered.
+        Explicit positions may go past `max_seq_len` too: pass the largest one as `max_position` if it is
+        known, otherwise it is read from `token_positions`, which costs a device sync when they are not on
+        the cpu.
+        """
+        seq_len = x.shape[-2]
+        if token_positions is None:
+            self._extend(offset + seq_len)
+            cos, sin = self.cos[offset:offset + seq_len], self.sin[offset:offset + seq_len]
+        else:
+            if max_position is None and token_positions.numel():
+                max_position = int(token_positions.max())
+            self._extend(max(offset + seq_len, (max_position or 0) + 1))
+            cos, sin = self.cos[token_positions], self.sin[token_positions]
+        cos, sin = cos.to(x.dtype), sin.to(x.dtype)
+        even, odd = x[..., 0::2], x[..., 1::2]
+        return torch.stack((even * cos - odd * sin, even * sin + odd * cos), dim=-1).flatten(-2)
+
+
+class MultiHeadSelfAttention(nn.Module):
+    """
+    Causal multi-head self-attention. The query, key and value projections of all heads are stored
+    stacked as one `qkv_proj`, so they come out of a single matmul over the input; state dicts with
+    separate `q_proj.weight`, `k_proj.weight` and `v_proj.weight` load as well.
+    """
+    def __init__(
+        self,
+        d_model: int,
+        num_heads: int,
+        rope: RotaryPositionalEmbedding | None = None,
+        device: torch.device | None = None,
+        dtype: torch.dtype | None = None,
+    ):
+        """
+        Args:
+            d_model (int): size of the input and output vectors, split evenly between the heads.
+            num_heads (int): number of attention heads.
+            rope (RotaryPositionalEmbedding | None): applied to the queries and keys of every head. May be
+                shared with other layers.
+        """
+        super().__init__()
+        if d_model % num_heads:
+            raise ValueError(f"d_model={d_model} is not divisible by num_heads={num_heads}")
+        self.d_model = d_model
+        self.num_heads = num_heads
+        self.rope = rope
+        self.qkv_proj = Linear(d_model, 3 * d_model, device=device, dtype=dtype)
+        self.output_proj = Linear(d_model, d_model, device=device, dtype=dtype)
+
+    def project_qkv(self, x: Float[Tensor, " ... seq d_model"]) -> tuple[Tensor, Tensor, Tensor]:
+        """Queries, keys and values of all heads, each of shape (..., seq, d_model)."""
+        return self.qkv_proj(x).split(self.d_model, dim=-1)
+
+    def forward(
+        self,
+        x: Float[Tensor, " ... seq d_model"],
+        token_positions: Int[Tensor, " ... seq"] | None = None,
+        kv_cache: LayerKVCache | None = None,
+    ) -> Float[Tensor, " ... seq d_model"]:
+        """
+        With a `kv_cache`, `x` holds the tokens following the cached ones, which it attends to as well.
+        Positions default to the index of each token in the whole sequence.
+        """
+        seq_len = x.shape[-2]
+        start = 0 if kv_cache is None else kv_cache.length
+        # (..., seq, d_model) -> (..., heads, seq, d_head)
+        q, k, v = (t.unflatten(-1, (self.num_heads, -1)).transpose(-3, -2) for t in self.project_qkv(x))
+        if self.rope is not None and token_positions is None:
+            q, k = self.rope(q, offset=start), self.rope(k, offset=start)
+        elif self.rope is not None:
+            # one set of positions for all heads
+            token_positions = token_positions.unsqueeze(-2)
+            q, k = self.rope(q, token_positions, start), self.rope(k, token_positions, start)
+        if kv_cache is not None:
+            k, v = kv_cache.append(k, v)
+        # query i sits at position start + i and sees keys up to there
+        mask = torch.ones(seq_len, start + seq_len, dtype=torch.bool, device=x.device).tril(start)
+        out = scaled_dot_product_attention(q, k, v, mask)
+        return self.output_proj(out.transpose(-3, -2).flatten(-2))
+
+    def _load_from_state_dict(self, state_dict: dict, prefix: str, *args, **kwargs):
+        split_keys = [f"{prefix}{name}_proj.weight" for name in "qkv"]
+        if all(key in state_dict for key in split_keys):
+            state_dict[f"{prefix}qkv_proj.weight"] = torch.cat([state_dict.pop(key) for key in split_keys])
+        super()._load_from_state_dict(state_dict, prefix, *args, **kwargs)
@@ -0,0 +1,88 @@
+"""
+Pieces of autoregressive decoding: a preallocated key/value cache, so that each new token only attends
+over stored keys and values instead of re-running the whole context, and next-token sampling with
+temperature and top-p.
+"""
+import torch
+from jaxtyping import Float
+from torch import Tensor
+
+
+class LayerKVCache:
+    """Keys and values of one attention layer, stored in place in buffers of `max_seq_len` positions."""
+    def __init__(
+        self,
+        batch_size: int,
+        num_heads: int,
+        max_seq_len: int,
+        d_head: int,
+        device: torch.device | None = None,
+        dtype: torch.dtype | None = None,
+    ):
+        self.keys = torch.empty(batch_size, num_heads, max_seq_len, d_head, device=device, dtype=dtype)
+        self.values = torch.empty_like(self.keys)
+        self.length = 0
+
+    @property
+    def max_seq_len(self) -> int:
+        return self.keys.shape[-2]
+
+    def append(
+        self, k: Float[Tensor, " batch heads seq d_head"], v: Float[Tensor, " batch heads seq d_head"]
+    ) -> tuple[Float[Tensor, " batch heads length d_head"], Float[Tensor, " batch heads length d_head"]]:
+        """Store the keys and values of the next positions and return those of all positions so far."""
+        end = self.length + k.shape[-2]
+        if end > self.max_seq_len:
+            raise ValueError(f"{end} positions do not fit a KV cache of {self.max_seq_len}")
+        self.keys[..., self.length:end, :] = k
+        self.values[..., self.length:end, :] = v
+        self.length = end
+        return self.keys[..., :end, :], self.values[..., :end, :]
+
+
+class KVCache:
+    """
+    One `LayerKVCache` per transformer block. Pass it to every forward call of a sequence; the new tokens
+    are placed after the `length` cached ones.
+
+        cache = model.make_kv_cache(batch_size=1)
+        logits = model(prompt_ids, kv_cache=cache)
+        logits = model(next_ids, kv_cache=cache)
+    """
+    def __init__(self, num_layers: int, *args, **kwargs):
+        """`args` and `kwargs` are those of `LayerKVCache`."""
+        self.layers = [LayerKVCache(*args, **kwargs) for _ in range(num_layers)]
+
+    @property
+    def length(self) -> int:
+        return self.layers[0].length
+
+    @property
+    def max_seq_len(self) -> int:
+        return self.layers[0].max_seq_len
+
+    def reset(self):
+        """Start a new sequence, reusing the buffers."""
+        for layer in self.layers:
+            layer.length = 0
+
+
+def sample_token(
+    logits: Float[Tensor, " vocab_size"],
+    temperature: float = 1.0,
+    top_p: float = 1.0,
+    generator: torch.Generator | None = None,
+) -> int:
+    """
+    Sample a token id from `softmax(logits / temperature)`, restricted to the smallest set of most likely
+    tokens whose probability adds up to at least `top_p`. Temperature 0 picks the most likely token.
+    """
+    if temperature == 0:
+        return int(logits.argmax())
+    probs = torch.softmax(logits.float() / temperature, dim=-1)
+    if top_p < 1.0:
+        probs, ids = probs.sort(descending=True)
+        # keep a token while the tokens before it add up to less than top_p, so the first is always kept
+        probs[probs.cumsum(dim=-1) - probs >= top_p] = 0.0
+        return int(ids[torch.multinomial(probs, 1, generator=generator)])
+    return int(torch.multinomial(probs, 1, generator=generator))
@@ -0,0 +1,107 @@
+"""
+Basic layers of the transformer: bias-free linear projections, embeddings, RMSNorm and the SwiGLU
+feed-forward network.
+"""
+import math
+
+import torch
+from jaxtyping import Float, Int
+from torch import Tensor, nn
+
+
+def silu(x: Float[Tensor, " ..."]) -> Float[Tensor, " ..."]:
+    return x * torch.sigmoid(x)
+
+
+def softmax(x: Float[Tensor, " ..."], dim: int) -> Float[Tensor, " ..."]:
+    # subtracting the max keeps exp from overflowing and does not change the result
+    exp = torch.exp(x - x.amax(dim=dim, keepdim=True))
+    return exp / exp.sum(dim=dim, keepdim=True)
+
+
+class Linear(nn.Module):
+    def __init__(
+        self,
+        in_features: int,
+        out_features: int,
+        device: torch.device | None = None,
+        dtype: torch.dtype | None = None,
+    ):
+        """
+        Args:
+            in_features (int): size of the last dimension of the input.
+            out_features (int): size of the last dimension of the output.
+            device (torch.device | None): device of the weight.
+            dtype (torch.dtype | None): dtype of the weight.
+        """
+        super().__init__()
+        self.weight = nn.Parameter(torch.empty(out_features, in_features, device=device, dtype=dtype))
+        std = math.sqrt(2 / (in_features + out_features))
+        nn.init.trunc_normal_(self.weight, std=std, a=-3 * std, b=3 * std)
+
+    def forward(self, x: Float[Tensor, " ... d_in"]) -> Float[Tensor, " ... d_out"]:
+        return x @ self.weight.T
+
+
+class Embedding(nn.Module):
+    def __init__(
+        self,
+        num_embeddings: int,
+        embedding_dim: int,
+        device: torch.device | None = None,
+        dtype: torch.dtype | None = None,
+    ):
+        super().__init__()
+        self.weight = nn.Parameter(torch.empty(num_embeddings, embedding_dim, device=device, dtype=dtype))
+        nn.init.trunc_normal_(self.weight, std=1.0, a=-3.0, b=3.0)
+
+    def forward(self, token_ids: Int[Tensor, " ..."]) -> Float[Tensor, " ... d_model"]:
+        return self.weight[token_ids]
+
+
+class RMSNorm(nn.Module):
+    def __init__(
+        self,
+        d_model: int,
+        eps: float = 1e-5,
+        device: torch.device | None = None,
+        dtype: torch.dtype | None = None,
+    ):
+        super().__init__()
+        self.eps = eps
+        self.weight = nn.Parameter(torch.ones(d_model, device=device, dtype=dtype))
+
+    def forward(self, x: Float[Tensor, " ... d_model"]) -> Float[Tensor, " ... d_model"]:
+        # the mean of squares is taken in float32, low precision inputs would lose most of it
+        in_dtype = x.dtype
+        x = x.to(torch.float32)
+        x = x * torch.rsqrt(x.pow(2).mean(dim=-1, keepdim=True) + self.eps)
+        return (x * self.weight).to(in_dtype)
+
+
+class SwiGLU(nn.Module):
+    """
+    W2(SiLU(W1 x) * W3 x). W1 and W3 are stored stacked as one `w13` projection, so both come out of a
+    single matmul over the input; state dicts with separate `w1.weight` and `w3.weight` load as well.
+    """
+    def __init__(
+        self,
+        d_model: int,
+        d_ff: int,
+        device: torch.device | None = None,
+        dtype: torch.dtype | None = None,
+    ):
+        super().__init__()
+        self.d_ff = d_ff
+        self.w13 = Linear(d_model, 2 * d_ff, device=device, dtype=dtype)
+        self.w2 = Linear(d_ff, d_model, device=device, dtype=dtype)
+
+    def forward(self, x: Float[Tensor, " ... d_model"]) -> Float[Tensor, " ... d_model"]:
+        gate, up = self.w13(x).split(self.d_ff, dim=-1)
+        return self.w2(silu(gate) * up)
+
+    def _load_from_state_dict(self, state_dict: dict, prefix: str, *args, **kwargs):
+        split_keys = [f"{prefix}w1.weight", f"{prefix}w3.weight"]
+        if all(key in state_dict for key in split_keys):
+            state_dict[f"{prefix}w13.weight"] = torch.cat([state_dict.pop(key) for key in split_keys])
+        super()._load_from_state_dict(state_dict, prefix, *args, **kwargs)
@@ -0,0 +1,149 @@
+"""
+Pre-norm decoder-only transformer language model.
+"""
+import torch
+from jaxtyping import Float, Int
+from torch import Tensor, nn
+
+from .attention import MultiHeadSelfAttention, RotaryPositionalEmbedding
+from .decoding import KVCache, LayerKVCache, sample_token
+from .layers import Embedding, Linear, RMSNorm, SwiGLU
+
+
+class TransformerBlock(nn.Module):
+    def __init__(
+        self,
+        d_model: int,
+        num_heads: int,
+        d_ff: int,
+        rope: RotaryPositionalEmbedding | None = None,
+        device: torch.device | None = None,
+        dtype: torch.dtype | None = None,
+    ):
+        super().__init__()
+        self.ln1 = RMSNorm(d_model, device=device, dtype=dtype)
+        self.attn = MultiHeadSelfAttention(d_model, num_heads, rope, device=device, dtype=dtype)
+        self.ln2 = RMSNorm(d_model, device=device, dtype=dtype)
+        self.ffn = SwiGLU(d_model, d_ff, device=device, dtype=dtype)
+
+    def forward(
+        self,
+        x: Float[Tensor, " ... seq d_model"],
+        token_positions: Int[Tensor, " ... seq"] | None = None,
+        kv_cache: LayerKVCache | None = None,
+    ) -> Float[Tensor, " ... seq d_model"]:
+        x = x + self.attn(self.ln1(x), token_positions, kv_cache)
+        return x + self.ffn(self.ln2(x))
+
+
+class TransformerLM(nn.Module):
+    """
+    Token embeddings, `num_layers` pre-norm transformer blocks with RoPE, a final RMSNorm and an output
+    projection to next-token logits.
+
+    Attention and feed-forward weights are stored fused (`attn.qkv_proj`, `ffn.w13`), but the separate
+    `q_proj`/`k_proj`/`v_proj` and `w1`/`w3` keys of the reference state dict load too:
+
+        model = TransformerLM(**config)
+        model.load_state_dict(reference_state_dict)
+
+    `generate` decodes with a `KVCache`, so every new token costs one pass over the cached keys and
+    values rather than a forward pass over the whole context.
+    """
+    def __init__(
+        self,
+        vocab_size: int,
+        context_length: int,
+        d_model: int,
+        num_layers: int,
+        num_heads: int,
+        d_ff: int,
+        rope_theta: float = 10000.0,
+        device: torch.device | None = None,
+        dtype: torch.dtype | None = None,
+    ):
+        """
+        Args:
+            vocab_size (int): number of token ids.
+            context_length (int): longest sequence the model is run on.
+            d_model (int): size of the embeddings and of every block's input and output.
+            num_layers (int): number of transformer blocks.
+            num_heads (int): attention heads per block; must divide `d_model`.
+            d_ff (int): inner size of the feed-forward networks.
+            rope_theta (float): RoPE base frequency.
+        """
+        super().__init__()
+        self.context_length = context_length
+        self.token_embeddings = Embedding(vocab_size, d_model, device=device, dtype=dtype)
+        # one set of rotation tables for all layers
+        rope = RotaryPositionalEmbedding(rope_theta, d_model // num_heads, context_length, device=device, dtype=dtype)
+        self.layers = nn.ModuleList(
+            TransformerBlock(d_model, num_heads, d_ff, rope, device=device, dtype=dtype) for _ in range(num_layers)
+        )
+        self.ln_final = RMSNorm(d_model, device=device, dtype=dtype)
+        self.lm_head = Linear(d_model, vocab_size, device=device, dtype=dtype)
+
+    def forward(
+        self,
+        token_ids: Int[Tensor, " ... seq"],
+        token_positions: Int[Tensor, " ... seq"] | None = None,
+        kv_cache: KVCache | None = None,
+    ) -> Float[Tensor, " ... seq vocab_size"]:
+        """
+        Next-token logits at every position. With a `kv_cache`, `token_ids` continue the cached sequence
+        and are added to the cache.
+        """
+        x = self.token_embeddings(token_ids)
+        for i, layer in enumerate(self.layers):
+            x = layer(x, token_positions, None if kv_cache is None else kv_cache.layers[i])
+        return self.lm_head(self.ln_final(x))
+
+    def make_kv_cache(self, batch_size: int, max_seq_len: int | None = None) -> KVCache:
+        """An empty cache for `batch_size` sequences of up to `max_seq_len` tokens, the context length by default."""
+        attn = self.layers[0].attn
+        weight = self.lm_head.weight
+        return KVCache(
+            len(self.layers), batch_size, attn.num_heads, max_seq_len or self.context_length,
+            attn.d_model // attn.num_heads, device=weight.device, dtype=weight.dtype,
+        )
+
+    @torch.inference_mode()
+    def generate(
+        self,
+        prompt: Int[Tensor, " seq"] | list[int],
+        max_new_tokens: int,
+        temperature: float = 1.0,
+        top_p: float = 1.0,
+        stop_token: int | None = None,
+        generator: torch.Generator | None = None,
+    ) -> list[int]:
+        """
+        Continue `prompt` one sampled token at a time, see `sample_token`.
+
+        Args:
+            prompt (Int[Tensor, " seq"] | list[int]): token ids to continue.
+            max_new_tokens (int): most tokens to generate. Fewer are generated if the sequence reaches
+                the context length.
+            temperature (float): softmax temperature; 0 always picks the most likely token.
+            top_p (float): sample only from the most likely tokens that make up this probability mass.
+            stop_token (int | None): generation ends when this token is sampled. It is not returned.
+            generator (torch.Generator | None): source of randomness for sampling.
+
+        Returns:
+            list[int]: the generated token ids, without the prompt.
+        """
+        prompt = torch.as_tensor(prompt, dtype=torch.long, device=self.lm_head.weight.device)
+        if not 0 < len(prompt) <= self.context_length:
+            raise ValueError(f"prompt of {len(prompt)} tokens, expected 1 to {self.context_length}")
+        kv_cache = self.make_kv_cache(1, min(self.context_length, len(prompt) + max_new_tokens))
+        logits = self(prompt.unsqueeze(0), kv_cache=kv_cache)[0, -1]
+        generated = []
+        while len(generated) < max_new_tokens:
+            token = sample_token(logits, temperature, top_p, generator)
+            if token == stop_token:
+                break
+            generated.append(token)
+            if kv_cache.length == kv_cache.max_seq_len:
+                break
+            logits = self(prompt.new_tensor([[token]]), kv_cache=kv_cache)[0, -1]
+        return generated
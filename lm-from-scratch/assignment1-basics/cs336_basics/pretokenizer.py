@@ -0,0 +1,119 @@
+"""
+Scanner for the GPT-2 pretokenization pattern `tokenizer.PAT`.
+
+    '(?:[sdmt]|ll|ve|re)| ?\\p{L}+| ?\\p{N}+| ?[^\\s\\p{L}\\p{N}]+|\\s+(?!\\S)|\\s+
+
+Matching Unicode property classes is the slow part of that pattern. Here every code point is first
+replaced by a single ASCII character naming its class, looked up in a precomputed table, and a small
+pattern over that class alphabet is run instead. The class string has the same length as the text,
+so its match spans are the pretoken spans of the text:
+
+    L  letter                   s d m t l v r e  those lowercase ASCII letters, for the contractions
+    N  number                   ' (apostrophe)   starts a contraction, otherwise punctuation
+    ' ' (space)                 W  any other whitespace
+    O  anything else
+"""
+import re
+import sys
+from itertools import accumulate
+from typing import Iterator
+
+import numpy as np
+import regex
+
+# the class alphabet is plain ASCII, which the stdlib engine scans faster than `regex`
+_SCAN = re.compile(r"'(?:[sdmt]|ll|ve|re)| ?[Lsdmtlvre]+| ?N+| ?[O']+|[ W]+(?![^ W])|[ W]+")
+
+# below this length a dict lookup per character beats the fixed cost of the numpy path
+_TABLE_LOOKUP_MIN_LEN = 256
+# characters classified and scanned at a time. Blocks start small and grow, so a caller that stops
+# after the first few pretokens does not pay for classifying a whole block.
+_FIRST_BLOCK_LEN = 1 << 10
+_MAX_BLOCK_LEN = 1 << 16
+
+
+# class of every code point, classified by `regex` so it follows the same Unicode version as PAT.
+# Filled in a page of code points at a time on first use, so ASCII text only pays for the first page.
+_PAGE_BITS = 12
+_CLASS_TABLE = np.zeros(sys.maxunicode + 1, dtype=np.uint8)
+_PAGE_READY = np.zeros((sys.maxunicode >> _PAGE_BITS) + 1, dtype=bool)
+
+
+def _fill_page(page: int):
+    first = page << _PAGE_BITS
+    chars = "".join(map(chr, range(first, first + (1 << _PAGE_BITS))))
+    classes = np.full(len(chars), ord("O"), dtype=np.uint8)
+    # a code point is in at most one of the three classes
+    for pattern, char_class in ((r"\s+", "W"), (r"\p{N}+", "N"), (r"\p{L}+", "L")):
+        for match in regex.finditer(pattern, chars):
+            classes[match.start():match.end()] = ord(char_class)
+    for char in "sdmtlvre' ":
+        if ord(char) >> _PAGE_BITS == page:
+            classes[ord(char) - first] = ord(char)
+    _CLASS_TABLE[first:first + len(chars)] = classes
+    _PAGE_READY[page] = True
+
+
+class _CharClasses(dict):
+    """`str.translate` table from code point to class, filled in from `_CLASS_TABLE` on first use."""
+    def __missing__(self, codepoint: int) -> str:
+        if not _PAGE_READY[codepoint >> _PAGE_BITS]:
+            _fill_page(codepoint >> _PAGE_BITS)
+        char_class = self[codepoint] = chr(_CLASS_TABLE[codepoint])
+        return char_class
+
+
+_CHAR_CLASSES = _CharClasses()
+
+
+def char_classes(string: str) -> str:
+    """`string` with every character replaced by its class, see the module docstring."""
+    if len(string) < _TABLE_LOOKUP_MIN_LEN:
+        return string.translate(_CHAR_CLASSES)
+    # utf-32 gives one fixed-width code point per character, so the whole lookup is a single gather
+    codepoints = np.frombuffer(string.encode("utf-32-le", errors="surrogatepass"), dtype=np.uint32)
+    pages_used = np.bincount(codepoints >> _PAGE_BITS, minlength=len(_PAGE_READY)) > 0
+    for page in np.flatnonzero(pages_used & ~_PAGE_READY):
+        _fill_page(int(page))
+    return _CLASS_TABLE[codepoints].tobytes().decode("ascii")
+
+
+def _pretoken_bounds(string: str) -> Iterator[list[int]]:
+    """
+    Pretoken boundaries of `string`, a block at a time so memory stays bounded for long strings. Each list
+    starts where the previous one ended; consecutive entries of a list delimit one pretoken.
+    """
+    start = 0
+    block_len = _FIRST_BLOCK_LEN
+    while start < len(string):
+        end = min(len(string), start + block_len)
+        block_len = min(2 * block_len, _MAX_BLOCK_LEN)
+        while True:
+            pieces = _SCAN.findall(char_classes(string[start:end]))
+            if end == len(string):
+                break
+            # the last two pieces may change with the text after the block ("'" + "l" of a cut "'ll",
+            # whitespace before the next character), the others cannot
+            if len(pieces) > 2:
+                del pieces[-2:]
+                break
+            end = min(len(string), start + 2 * (end - start))
+        bounds = list(accumulate(map(len, pieces), initial=start))
+        yield bounds
+        start = bounds[-1]
+
+
+def pretoken_spans(string: str) -> Iterator[tuple[int, int]]:
+    """Yield (start, end) of every pretoken of `string`, the same spans as `re.finditer(PAT, string)`."""
+    for bounds in _pretoken_bounds(string):
+        ends = iter(bounds)
+        next(ends)
+        yield from zip(bounds, ends)
+
+
+def pretokenize(string: str) -> Iterator[str]:
+    """Yield the pretokens of `string`, the same strings as `re.findall(PAT, string)`."""
+    for bounds in _pretoken_bounds(string):
+        ends = iter(bounds)
+        next(ends)
+        yield from map(string.__getitem__, map(slice, bounds, ends))
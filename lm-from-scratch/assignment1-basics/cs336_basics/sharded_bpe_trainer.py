@@ -0,0 +1,121 @@
+"""
+BPE merge phase with the word table sharded across worker processes.
+
+Every worker owns a contiguous slice of the words and a `PairIndex` over it. The coordinator keeps the
+global pair counts and the max-heap of `BPETrainer`, so it picks exactly the pair the serial trainer
+would. For each merge it sends the pair to all workers, which rewrite their words in parallel and
+reply with the change of every pair count in their shard; the coordinator adds them up.
+
+A merge costs a round trip to every worker, so this only pays off when merges touch many words, with
+large word tables and vocabularies. The merges are identical to those of `BPETrainer`.
+
+    with ShardedBPETrainer(words, vocab, num_shards=8) as trainer:
+        trainer.train(vocab_size)
+"""
+import multiprocessing
+from collections import defaultdict
+from multiprocessing.connection import Connection
+
+import numpy as np
+
+from .train_bpe import BPETrainer, PairIndex, WordTable, group_pairs
+
+
+def _serve_shard(conn: Connection, words: WordTable):
+    index = PairIndex(words)
+    conn.send(None)
+    while (message := conn.recv()) is not None:
+        command, *args = message
+        if command == "merge":
+            conn.send(index.merge_pair(*args))
+        elif command == "words":
+            conn.send(index.words.compacted())
+        elif command == "index_sizes":
+            conn.send(index.index_sizes())
+    conn.close()
+
+
+def split_words(words: WordTable, num_shards: int) -> list[WordTable]:
+    """Contiguous slices of `words` with about the same number of token ids each."""
+    cut_ids = words.offsets[-1] * np.arange(1, num_shards) // num_shards
+    cuts = [0, *np.searchsorted(words.offsets, cut_ids).tolist(), len(words)]
+    shards = []
+    for start, end in zip(cuts, cuts[1:]):
+        offsets = words.offsets[start:end + 1]
+        shards.append(WordTable(
+            words.ids[offsets[0]:offsets[-1]].copy(), offsets - offsets[0], words.counts[start:end].copy(),
+            words.lengths[start:end].copy(),
+        ))
+    return shards
+
+
+class ShardedBPETrainer(BPETrainer):
+    """
+    `BPETrainer` whose words and inverted index live in `num_shards` worker processes, stopped by `close`
+    or at the end of a `with` block.
+    """
+    def __init__(self, words: WordTable | dict[tuple[int, ...], int], vocab: dict[int, bytes],
+                 merge_pairs: list[tuple[int, int]] | None = None, num_shards: int = 2):
+        """
+        Args:
+            words (WordTable | dict[tuple[int, ...], int]): token ids of every distinct pretoken and its count.
+            vocab (dict[int, bytes]): vocab the ids refer to. New tokens are added to it.
+            merge_pairs (list[tuple[int, int]] | None): ids of the merges already applied to `words`.
+            num_shards (int): number of worker processes.
+        """
+        self.num_shards = num_shards
+        super().__init__(words, vocab, merge_pairs)
+        # the workers have been building their indexes while the global counts and the heap were built here
+        for conn in self._conns:
+            conn.recv()
+
+    def _init_index(self, words: WordTable):
+        """Start a worker per shard of `words`; only the global pair counts are kept here."""
+        self._conns: list[Connection] = []
+        self._workers = []
+        for shard in split_words(words, self.num_shards):
+            conn, worker_conn = multiprocessing.Pipe()
+            worker = multiprocessing.Process(target=_serve_shard, args=(worker_conn, shard), daemon=True)
+            worker.start()
+            worker_conn.close()
+            self._conns.append(conn)
+            self._workers.append(worker)
+        pairs, counts, _, _ = group_pairs(words)
+        self.pair_counts: defaultdict[tuple[int, int], int] = defaultdict(int, zip(pairs, counts))
+
+    def _ask(self, *message) -> list:
+        for conn in self._conns:
+            conn.send(message)
+        return [conn.recv() for conn in self._conns]
+
+    @property
+    def words(self) -> WordTable:
+        """The current words of all shards, gathered into one compact table."""
+        shards = self._ask("words")
+        lengths = np.concatenate([shard.lengths for shard in shards])
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        ids = np.concatenate([shard.ids for shard in shards])
+        return WordTable(ids, offsets, np.concatenate([shard.counts for shard in shards]))
+
+    def merge_pair(self, pair: tuple[int, int], new_idx: int) -> dict[tuple[int, int], int]:
+        deltas = defaultdict(int)
+        for shard_deltas in self._ask("merge", pair, new_idx):
+            for changed_pair, delta in shard_deltas.items():
+                deltas[changed_pair] += delta
+        return self._apply_deltas(deltas)
+
+    def index_sizes(self) -> dict[str, int]:
+        sizes = {"heap_entries": len(self._heap), "pairs": len(self.pair_counts)}
+        for shard_sizes in self._ask("index_sizes"):
+            for name in ("words", "index_entries", "word_table_bytes"):
+                sizes[name] = sizes.get(name, 0) + shard_sizes[name]
+        return sizes
+
+    def close(self):
+        for conn in self._conns:
+            conn.send(None)
+            conn.close()
+        for worker in self._workers:
+            worker.join()
+        self._conns, self._workers = [], []
@@ -0,0 +1,79 @@
+import regex as re
+from typing import Iterable, Iterator
+
+_END = None  # trie key marking that the path from the root spells a whole token
+
+
+class SpecialTokenMatcher:
+    """
+    Finds special tokens in text with a precompiled trie. At every position the longest token wins
+    and matches never overlap, the same result as a regex alternation sorted longest first.
+
+    Candidate start positions are found with a single character class over the first characters
+    of all tokens, so the cost of a scan does not grow with the number of tokens, only with the
+    number of positions that look like the start of one.
+    """
+    def __init__(self, tokens: Iterable[str]):
+        self.tokens = sorted({token for token in tokens if token})
+        self.max_token_len = max((len(token) for token in self.tokens), default=0)
+        self._trie: dict = dict()
+        for token in self.tokens:
+            node = self._trie
+            for char in token:
+                node = node.setdefault(char, dict())
+            node[_END] = token
+        first_chars = "".join(sorted(self._trie.keys()))
+        self._candidates = re.compile("[" + re.escape(first_chars) + "]") if first_chars else None
+
+    def match(self, text: str, pos: int, endpos: int | None = None) -> str | None:
+        """Longest token in `text[:endpos]` starting at `pos`, or None."""
+        endpos = len(text) if endpos is None else endpos
+        node = self._trie
+        found = None
+        for i in range(pos, min(endpos, pos + self.max_token_len)):
+            node = node.get(text[i])
+            if node is None:
+                break
+            found = node.get(_END, found)
+        return found
+
+    def finditer(self, text: str, pos: int = 0, endpos: int | None = None) -> Iterator[tuple[int, int, str]]:
+        """Yield (start, end, token) for every special token in `text[pos:endpos]`, left to right."""
+        if self._candidates is None:
+            return
+        endpos = len(text) if endpos is None else endpos
+        search = self._candidates.search
+        while (candidate := search(text, pos, endpos)) is not None:
+            start = candidate.start()
+            token = self.match(text, start, endpos)
+            if token is None:
+                pos = start + 1
+            else:
+                pos = start + len(token)
+                yield start, pos, token
+
+    def split(self, text: str) -> list[str]:
+        """Split `text` around special tokens, keeping them, like `re.split` with a capturing group."""
+        pieces = []
+        pos = 0
+        for start, end, token in self.finditer(text):
+            pieces.append(text[pos:start])
+            pieces.append(token)
+            pos = end
+        pieces.append(text[pos:])
+        return pieces
+
+    def partial_suffix_start(self, text: str) -> int:
+        """
+        Earliest position from which the rest of `text` is a proper prefix of some special token,
+        i.e. a token that may still be completed by text that follows. `len(text)` if there is none.
+        """
+        for start in range(max(0, len(text) - self.max_token_len + 1), len(text)):
+            node = self._trie
+            for char in text[start:]:
+                node = node.get(char)
+                if node is None:
+                    break
+            if node is not None and any(key is not _END for key in node):
+                return start
+        return len(text)
@@ -0,0 +1,189 @@
+"""
+Content-addressed on-disk cache of tokenized files.
+
+An entry is the raw token array of one file, stored under a key derived from the sha256 of the file
+content and the tokenizer's `fingerprint`, so a renamed or copied file still hits and a changed file
+or tokenizer never does. Hits are returned as read-only memory maps. When the entries add up to more
+than `max_bytes`, the least recently used ones are deleted.
+
+    cache = TokenCache("~/.cache/cs336_tokens")
+    ids = cache.tokenize_file("data/TinyStoriesV2-GPT4-valid.txt", tokenizer)
+    print(cache.stats())
+"""
+import hashlib
+import json
+import os
+import tempfile
+import time
+from typing import NamedTuple
+
+import numpy as np
+
+from .bpe_tokenizer import BPETokenizer
+
+ENTRY_SUFFIX = ".tokens"
+# content hashes of files already seen, keyed by path and validated by size and mtime
+HASHES_FILENAME = "file_hashes.json"
+DEFAULT_MAX_BYTES = 16 << 30
+# characters handed to the tokenizer at a time on a miss
+READ_CHARS = 1 << 22
+
+
+class TokenCacheStats(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    hit_seconds: float
+    miss_seconds: float
+    entries: int
+    size_bytes: int
+    max_bytes: int
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    @property
+    def mean_hit_seconds(self) -> float:
+        return self.hit_seconds / self.hits if self.hits else 0.0
+
+    @property
+    def mean_miss_seconds(self) -> float:
+        return self.miss_seconds / self.misses if self.misses else 0.0
+
+
+def file_sha256(path: str | os.PathLike) -> str:
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+class TokenCache:
+    def __init__(self, cache_dir: str | os.PathLike, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        Args:
+            cache_dir (str | os.PathLike): directory holding the entries, created if missing. May be shared
+                by several processes; entries are written to a temporary file and renamed into place.
+            max_bytes (int): total size of the entries above which the least recently used are evicted.
+        """
+        self.cache_dir = os.path.expanduser(os.fspath(cache_dir))
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.hit_seconds = 0.0
+        self.miss_seconds = 0.0
+
+    def key(self, path: str | os.PathLike, tokenizer: BPETokenizer) -> str:
+        """Cache key of the token ids of the file at `path` under `tokenizer`."""
+        return hashlib.sha256(f"{self._content_hash(path)}:{tokenizer.fingerprint}".encode()).hexdigest()
+
+    def entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + ENTRY_SUFFIX)
+
+    def tokenize_file(self, path: str | os.PathLike, tokenizer: BPETokenizer) -> np.ndarray:
+        """
+        Token ids of the UTF-8 file at `path`, as a read-only `tokenizer.token_dtype` memory map.
+        Equal to `tokenizer.encode_to_array(text)` of the file's text.
+        """
+        start = time.perf_counter()
+        entry_path = self.entry_path(self.key(path, tokenizer))
+        if os.path.exists(entry_path):
+            # the modification time doubles as the last access time for LRU eviction
+            os.utime(entry_path)
+            ids = self._load(entry_path, tokenizer.token_dtype)
+            self.hits += 1
+            self.hit_seconds += time.perf_counter() - start
+            return ids
+
+        self._write_entry(path, tokenizer, entry_path)
+        self._evict(keep=entry_path)
+        ids = self._load(entry_path, tokenizer.token_dtype)
+        self.misses += 1
+        self.miss_seconds += time.perf_counter() - start
+        return ids
+
+    def _write_entry(self, path: str | os.PathLike, tokenizer: BPETokenizer, entry_path: str):
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            # newline="" keeps "\r\n" as is, the same text as decoding the bytes
+            with os.fdopen(fd, "wb") as out, open(path, encoding="utf-8", newline="") as f:
+                for ids in tokenizer.encode_iterable_arrays(iter(lambda: f.read(READ_CHARS), "")):
+                    ids.tofile(out)
+            os.replace(tmp_path, entry_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    @staticmethod
+    def _load(entry_path: str, dtype: np.dtype) -> np.ndarray:
+        if os.path.getsize(entry_path) == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(entry_path, dtype=dtype, mode="r")
+
+    def _entries(self) -> list[os.DirEntry]:
+        with os.scandir(self.cache_dir) as it:
+            return [entry for entry in it if entry.name.endswith(ENTRY_SUFFIX)]
+
+    def _evict(self, keep: str | None = None):
+        """Delete least recently used entries until the total size is at most `max_bytes`; `keep` is never deleted."""
+        entries = sorted(((entry.stat(), entry.path) for entry in self._entries()), key=lambda e: e[0].st_mtime_ns)
+        total = sum(stat.st_size for stat, _ in entries)
+        for stat, entry_path in entries:
+            if total <= self.max_bytes:
+                break
+            if entry_path == keep:
+                continue
+            try:
+                os.unlink(entry_path)
+            except FileNotFoundError:  # evicted by another process
+                pass
+            total -= stat.st_size
+            self.evictions += 1
+
+    def _content_hash(self, path: str | os.PathLike) -> str:
+        # hashing dominates the cost of a hit, so a file whose size and mtime are unchanged is not rehashed
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        hashes_path = os.path.join(self.cache_dir, HASHES_FILENAME)
+        try:
+            with open(hashes_path) as f:
+                hashes = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            hashes = dict()
+        known = hashes.get(path)
+        if known is not None and known["size"] == stat.st_size and known["mtime_ns"] == stat.st_mtime_ns:
+            return known["sha256"]
+        sha256 = file_sha256(path)
+        hashes[path] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": sha256}
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(hashes, f)
+        os.replace(tmp_path, hashes_path)
+        return sha256
+
+    def size_bytes(self) -> int:
+        return sum(entry.stat().st_size for entry in self._entries())
+
+    def stats(self) -> TokenCacheStats:
+        entries = self._entries()
+        return TokenCacheStats(
+            self.hits,
+            self.misses,
+            self.evictions,
+            self.hit_seconds,
+            self.miss_seconds,
+            len(entries),
+            sum(entry.stat().st_size for entry in entries),
+            self.max_bytes,
+        )
+
+    def clear(self):
+        """Delete every entry and the remembered file hashes."""
+        for entry in self._entries():
+            os.unlink(entry.path)
+        try:
+            os.unlink(os.path.join(self.cache_dir, HASHES_FILENAME))
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,128 @@
+"""
+Tokenize a large text file into token shards using all cores.
+
+The file is split on a special token with `plan_chunks`, every chunk is encoded by a
+process pool and written as a raw uint16/uint32 shard, and an `index.json` describing the shards
+is written next to them.
+
+    uv run python -m cs336_basics.tokenize_corpus data/owt_train.txt data/owt_train_tokens \\
+        --vocab vocab.json --merges merges.txt --special-token "<|endoftext|>"
+"""
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .bpe_tokenizer import BPETokenizer
+from .chunking import plan_chunks
+from .tokenizer_pool import init_worker, worker_tokenizer
+
+INDEX_FILENAME = "index.json"
+DEFAULT_CHUNK_BYTES = 1 << 24
+DEFAULT_CHUNKS_PER_WORKER = 4
+
+
+def _tokenize_chunk(input_path: str, start: int, end: int, shard_path: str) -> int:
+    with open(input_path, "rb") as f:
+        f.seek(start)
+        text = f.read(end - start).decode("utf-8")
+    ids = worker_tokenizer().encode_to_array(text)
+    ids.tofile(shard_path)
+    return len(ids)
+
+
+def tokenize_to_shards(
+    input_path: str | os.PathLike,
+    output_dir: str | os.PathLike,
+    tokenizer: BPETokenizer,
+    num_workers: int | None = None,
+    chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+    split_special_token: str = "<|endoftext|>",
+    chunks_per_worker: int = DEFAULT_CHUNKS_PER_WORKER,
+) -> dict:
+    """
+    Tokenize `input_path` in parallel and write one shard per chunk into `output_dir`.
+
+    Args:
+        input_path (str | os.PathLike): text file to tokenize.
+        output_dir (str | os.PathLike): directory for the shards and the index file.
+        tokenizer (BPETokenizer): tokenizer to use, copied once into every worker.
+        num_workers (int | None): number of worker processes. Defaults to the number of cpus.
+        chunk_bytes (int): target chunk size; the file is split into at least `num_workers` chunks.
+        split_special_token (str): special token of `tokenizer` that chunks are split on.
+        chunks_per_worker (int): minimum number of chunks per worker, so that workers done early pick up
+            the chunks left over instead of waiting for the slowest one.
+
+    Returns:
+        dict: the index written to `output_dir/index.json`.
+    """
+    if split_special_token not in tokenizer.special_token_to_idx:
+        raise ValueError(f"{split_special_token!r} is not a special token of the tokenizer")
+    input_path = os.fspath(input_path)
+    os.makedirs(output_dir, exist_ok=True)
+    num_workers = num_workers or os.cpu_count() or 1
+    spans = plan_chunks(input_path, [split_special_token.encode("utf-8")], num_workers, chunk_bytes, chunks_per_worker)
+    dtype = tokenizer.token_dtype
+
+    shard_names = [f"shard_{i:05d}.bin" for i in range(len(spans))]
+    with ProcessPoolExecutor(num_workers, initializer=init_worker, initargs=(tokenizer,)) as pool:
+        futures = [
+            pool.submit(_tokenize_chunk, input_path, start, end, os.path.join(output_dir, name))
+            for (start, end), name in zip(spans, shard_names)
+        ]
+        num_tokens = [future.result() for future in futures]
+
+    shards = []
+    token_offset = 0
+    for (start, end), name, n in zip(spans, shard_names, num_tokens):
+        shards.append({"path": name, "byte_start": start, "byte_end": end, "token_offset": token_offset, "num_tokens": n})
+        token_offset += n
+    index = {"source": os.path.abspath(input_path), "dtype": dtype.name, "num_tokens": token_offset, "shards": shards}
+    with open(os.path.join(output_dir, INDEX_FILENAME), "w") as f:
+        json.dump(index, f, indent=2)
+    return index
+
+
+def load_shards(output_dir: str | os.PathLike) -> list[np.memmap]:
+    """Memory-map every shard listed in the index of `output_dir`, in corpus order."""
+    with open(os.path.join(output_dir, INDEX_FILENAME)) as f:
+        index = json.load(f)
+    return [
+        np.memmap(os.path.join(output_dir, shard["path"]), dtype=index["dtype"], mode="r", shape=(shard["num_tokens"],))
+        if shard["num_tokens"]
+        else np.empty(0, dtype=index["dtype"])
+        for shard in index["shards"]
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input_path")
+    parser.add_argument("output_dir")
+    parser.add_argument("--vocab", required=True, help="vocab json, as read by BPETokenizer.from_files")
+    parser.add_argument("--merges", required=True, help="merges file, as read by BPETokenizer.from_files")
+    parser.add_argument("--special-token", action="append", dest="special_tokens", default=None)
+    parser.add_argument("--split-special-token", default="<|endoftext|>")
+    parser.add_argument("--num-workers", type=int, default=None)
+    parser.add_argument("--chunk-bytes", type=int, default=DEFAULT_CHUNK_BYTES)
+    parser.add_argument("--chunks-per-worker", type=int, default=DEFAULT_CHUNKS_PER_WORKER)
+    args = parser.parse_args()
+
+    special_tokens = args.special_tokens or [args.split_special_token]
+    tokenizer = BPETokenizer.from_files(args.vocab, args.merges, special_tokens)
+    index = tokenize_to_shards(
+        args.input_path,
+        args.output_dir,
+        tokenizer,
+        num_workers=args.num_workers,
+        chunk_bytes=args.chunk_bytes,
+        split_special_token=args.split_special_token,
+        chunks_per_worker=args.chunks_per_worker,
+    )
+    print(f"wrote {index['num_tokens']} tokens in {len(index['shards'])} shards to {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,9 +2,13 @@ from abc import ABC
 import regex as re
 from typing import Iterable, Iterator
 
+# re-exported, so `cs336_basics.tokenizer.pretokenize` is the fast scanner
+from .pretokenizer import pretokenize as pretokenize
+
 PAT = r"""'(?:[sdmt]|ll|ve|re)| ?\p{L}+| ?\p{N}+| ?[^\s\p{L}\p{N}]+|\s+(?!\S)|\s+"""
 
-def pretokenize(string: str):
+def pretokenize_regex(string: str):
+    """Reference pretokenizer running PAT directly; `pretokenize` gives the same pretokens faster."""
     for match in re.finditer(PAT, string):
         yield string[match.start():match.end()]
 
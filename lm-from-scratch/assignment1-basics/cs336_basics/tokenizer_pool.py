@@ -0,0 +1,114 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Sequence
+
+import numpy as np
+
+# set once per worker process by the pool initializer, so the tokenizer is not pickled per task
+_worker_tokenizer = None
+
+
+def init_worker(tokenizer):
+    global _worker_tokenizer
+    _worker_tokenizer = tokenizer
+
+
+def worker_tokenizer():
+    """The tokenizer copy owned by the current worker process."""
+    return _worker_tokenizer
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def _encode_group(texts: Sequence[str]) -> tuple[np.ndarray, np.ndarray]:
+    # one flat array plus lengths pickles far smaller than a list of lists of ints
+    arrays = [_worker_tokenizer.encode_to_array(text) for text in texts]
+    lengths = np.array([len(a) for a in arrays], dtype=np.int64)
+    flat = np.concatenate(arrays) if arrays else np.empty(0, dtype=_worker_tokenizer.token_dtype)
+    return flat, lengths
+
+
+def _decode_group(flat: np.ndarray, lengths: np.ndarray) -> list[str]:
+    return [_worker_tokenizer.decode_array(tokens) for tokens in np.split(flat, np.cumsum(lengths)[:-1])]
+
+
+def _groups(sizes: Sequence[int], group_size: int, num_workers: int = 1) -> list[tuple[int, int]]:
+    """
+    Split consecutive items into (start, end) runs whose sizes add up to about `group_size`, or less when
+    that leaves fewer than `num_workers` runs, so that a batch is spread over all workers.
+    """
+    group_size = max(1, min(group_size, -(-sum(sizes) // num_workers)))
+    groups = []
+    start = total = 0
+    for i, size in enumerate(sizes):
+        total += size
+        if total >= group_size:
+            groups.append((start, i + 1))
+            start, total = i + 1, 0
+    if start < len(sizes):
+        groups.append((start, len(sizes)))
+    return groups
+
+
+class TokenizerPool:
+    """
+    Persistent process pool in which every worker holds its own copy of a tokenizer. Workers are started
+    and their tokenizer loaded when the pool is created, not on the first batch. Small inputs are grouped
+    into one task to amortize IPC, and batches below `inline_threshold` are handled in the calling process.
+    """
+    DEFAULT_GROUP_SIZE = 1 << 16
+    DEFAULT_INLINE_THRESHOLD = 1 << 14
+
+    def __init__(self, tokenizer, num_workers: int | None = None, group_size: int = DEFAULT_GROUP_SIZE,
+                 inline_threshold: int = DEFAULT_INLINE_THRESHOLD):
+        """
+        Args:
+            tokenizer (BPETokenizer): tokenizer copied into every worker.
+            num_workers (int | None): number of worker processes. Defaults to the number of cpus.
+            group_size (int): characters (for encoding) or tokens (for decoding) per task. Smaller batches
+                are split into at least `num_workers` tasks.
+            inline_threshold (int): batches with fewer characters/tokens than this are not dispatched.
+        """
+        self.tokenizer = tokenizer
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.group_size = group_size
+        self.inline_threshold = inline_threshold
+        self._executor = ProcessPoolExecutor(self.num_workers, initializer=init_worker, initargs=(tokenizer,))
+        # one task per worker makes the executor start all of them now
+        for future in [self._executor.submit(_ping) for _ in range(self.num_workers)]:
+            future.result()
+
+    def encode_batch(self, texts: Sequence[str]) -> list[list[int]]:
+        sizes = [len(text) for text in texts]
+        if sum(sizes) < self.inline_threshold:
+            return [self.tokenizer.encode(text) for text in texts]
+        futures = [
+            self._executor.submit(_encode_group, texts[start:end])
+            for start, end in _groups(sizes, self.group_size, self.num_workers)
+        ]
+        encoded = []
+        for future in futures:
+            flat, lengths = future.result()
+            encoded.extend(tokens.tolist() for tokens in np.split(flat, np.cumsum(lengths)[:-1]))
+        return encoded
+
+    def decode_batch(self, batch: Sequence[Sequence[int]]) -> list[str]:
+        sizes = [len(tokens) for tokens in batch]
+        if sum(sizes) < self.inline_threshold:
+            return [self.tokenizer.decode(tokens) for tokens in batch]
+        futures = []
+        for start, end in _groups(sizes, self.group_size, self.num_workers):
+            flat = np.fromiter((t for tokens in batch[start:end] for t in tokens), dtype=np.int64, count=sum(sizes[start:end]))
+            futures.append(self._executor.submit(_decode_group, flat, np.array(sizes[start:end], dtype=np.int64)))
+        return [text for future in futures for text in future.result()]
+
+    def close(self):
+        self._executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,544 @@
+"""
+Byte-level BPE training.
+
+Pretokens are counted in parallel: the input is split on the special tokens with `plan_chunks`, every
+worker counts the pretokens of a contiguous run of chunks (with special tokens stripped, so no
+merge ever crosses them), and the per-worker counts are merged into the largest one. Merges are then
+learned from the pretoken counts alone, see `BPETrainer`.
+"""
+import heapq
+import json
+import os
+import tempfile
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import AbstractContextManager, nullcontext
+from functools import reduce
+from itertools import repeat
+
+import numpy as np
+
+from .bpe_profiler import TrainingProfiler
+from .chunking import iter_chunks, plan_chunks
+from .external_counts import ENTRY_BYTES, SpillingCounter, merge_runs
+from .pretokenizer import pretokenize
+from .special_tokens import SpecialTokenMatcher
+
+DEFAULT_CHUNK_BYTES = 1 << 24
+DEFAULT_CHECKPOINT_EVERY = 1000
+
+
+def _phase(profiler: TrainingProfiler | None, name: str) -> AbstractContextManager:
+    return nullcontext() if profiler is None else profiler.phase(name)
+
+
+def _count_spans(
+    input_path: str, spans: list[tuple[int, int]], special_tokens: list[str], spill_dir: str | None = None,
+    max_entries: int | None = None,
+) -> dict[bytes, int] | list[str]:
+    """
+    Pretoken counts of the byte ranges `spans` of the file, keyed by the UTF-8 bytes of the pretoken.
+    With `max_entries`, the counts are spilled to run files in `spill_dir` instead and their paths returned.
+    """
+    matcher = SpecialTokenMatcher(special_tokens)
+    counts = Counter() if max_entries is None else SpillingCounter(spill_dir, max_entries)
+    for chunk in iter_chunks(input_path, spans):
+        text = str(chunk, "utf-8", "ignore")
+        # every other piece of the split is a special token
+        for piece in matcher.split(text)[::2]:
+            counts.update(pretokenize(piece))
+    if max_entries is not None:
+        counts.spill()
+        return counts.runs
+    return {pretoken.encode("utf-8"): count for pretoken, count in counts.items()}
+
+
+def _merge_counts(a: dict[bytes, int], b: dict[bytes, int]) -> dict[bytes, int]:
+    if len(a) < len(b):
+        a, b = b, a
+    for pretoken, count in b.items():
+        a[pretoken] = a.get(pretoken, 0) + count
+    return a
+
+
+def count_pretokens(
+    input_path: str | os.PathLike,
+    special_tokens: list[str],
+    num_workers: int | None = None,
+    chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+    memory_budget: int | None = None,
+    spill_dir: str | os.PathLike | None = None,
+    min_count: int = 1,
+    profiler: TrainingProfiler | None = None,
+) -> dict[bytes, int]:
+    """
+    Count the pretokens of a UTF-8 text file, skipping special tokens.
+
+    Args:
+        input_path (str | os.PathLike): text file to count.
+        special_tokens (list[str]): removed from the text before pretokenizing. The file is split into
+            chunks on any of them; without special tokens it is counted in a single process.
+        num_workers (int | None): number of worker processes. Defaults to the number of cpus.
+        chunk_bytes (int): target size of the pieces read at a time by a worker.
+        memory_budget (int | None): approximate bytes the partial counts of all workers may take. When
+            given, workers spill their counts to sorted run files whenever they exceed their share of
+            it, and the runs are k-way merged at the end. Only the result is held in memory.
+        spill_dir (str | os.PathLike | None): where run files are written. Defaults to the temp directory.
+        min_count (int): pretokens seen fewer times than this in total are left out of the result.
+        profiler (TrainingProfiler | None): times planning the chunks, counting them (pretokenization
+            included, the two are interleaved in the workers) and reducing the worker counts.
+
+    Returns:
+        dict[bytes, int]: pretoken (UTF-8 bytes) -> number of occurrences.
+    """
+    input_path = os.fspath(input_path)
+    num_workers = num_workers or os.cpu_count() or 1
+    with _phase(profiler, "plan_chunks"):
+        spans = plan_chunks(input_path, [token.encode("utf-8") for token in special_tokens], num_workers, chunk_bytes)
+
+    # one contiguous run of chunks per worker, read a chunk at a time
+    num_groups = min(num_workers, len(spans))
+    groups = [spans[len(spans) * i // num_groups : len(spans) * (i + 1) // num_groups] for i in range(num_groups)]
+    if profiler is not None:
+        profiler.record(num_chunks=len(spans), num_count_workers=num_groups)
+    if memory_budget is not None:
+        max_entries = max(1, memory_budget // ENTRY_BYTES // max(1, num_groups))
+        with tempfile.TemporaryDirectory(prefix="bpe_counts_", dir=spill_dir) as run_dir:
+            with _phase(profiler, "pretokenize_and_count"):
+                if num_groups <= 1:
+                    runs = _count_spans(input_path, spans, special_tokens, run_dir, max_entries)
+                else:
+                    with ProcessPoolExecutor(num_groups) as pool:
+                        args = (
+                            repeat(input_path), groups, repeat(special_tokens), repeat(run_dir), repeat(max_entries)
+                        )
+                        runs = [run for worker_runs in pool.map(_count_spans, *args) for run in worker_runs]
+            with _phase(profiler, "reduce_counts"):
+                return dict(merge_runs(runs, min_count, delete=True))
+
+    if num_groups <= 1:
+        with _phase(profiler, "pretokenize_and_count"):
+            counts = _count_spans(input_path, spans, special_tokens)
+    else:
+        with ProcessPoolExecutor(num_groups) as pool:
+            with _phase(profiler, "pretokenize_and_count"):
+                counts = list(pool.map(_count_spans, repeat(input_path), groups, repeat(special_tokens)))
+        # merged here rather than in the pool: sending partial counts back and forth costs more than merging
+        with _phase(profiler, "reduce_counts"):
+            counts = reduce(_merge_counts, counts)
+    if min_count > 1:
+        counts = {pretoken: count for pretoken, count in counts.items() if count >= min_count}
+    return counts
+
+
+def _merge_word(word: list[int], pair: tuple[int, int], new_idx: int) -> list[int]:
+    merged = []
+    i = 0
+    while i < len(word):
+        if i + 1 < len(word) and word[i] == pair[0] and word[i + 1] == pair[1]:
+            merged.append(new_idx)
+            i += 2
+        else:
+            merged.append(word[i])
+            i += 1
+    return merged
+
+
+class _Descending:
+    """Reverses the order of the wrapped value, so a min-heap pops the greatest one first."""
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other: "_Descending") -> bool:
+        return self.value > other.value
+
+    def __eq__(self, other: "_Descending") -> bool:
+        return self.value == other.value
+
+
+class WordTable:
+    """
+    The distinct pretokens of a corpus as token ids in flat arrays: word i is
+    `ids[offsets[i]:offsets[i] + lengths[i]]` and was seen `counts[i]` times. A merge rewrites a word
+    in place and only shortens it, so offsets never change and nothing is reallocated.
+    """
+    def __init__(self, ids: np.ndarray, offsets: np.ndarray, counts: np.ndarray, lengths: np.ndarray | None = None):
+        self.ids = ids
+        self.offsets = offsets
+        self.counts = counts
+        self.lengths = np.diff(offsets).astype(np.int32) if lengths is None else lengths
+
+    @classmethod
+    def from_words(cls, words: dict[tuple[int, ...], int]) -> "WordTable":
+        lengths = np.fromiter(map(len, words), dtype=np.int64, count=len(words))
+        offsets = np.zeros(len(words) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        ids = np.fromiter((idx for word in words for idx in word), dtype=np.int32, count=int(offsets[-1]))
+        return cls(ids, offsets, np.fromiter(words.values(), dtype=np.int64, count=len(words)))
+
+    @classmethod
+    def from_pretoken_counts(cls, pretoken_counts: dict[bytes, int], byte_to_idx: dict[int, int]) -> "WordTable":
+        """Byte-level table: every byte of a pretoken becomes the id `byte_to_idx` maps it to."""
+        lengths = np.fromiter(map(len, pretoken_counts), dtype=np.int64, count=len(pretoken_counts))
+        offsets = np.zeros(len(pretoken_counts) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        byte_ids = np.zeros(256, dtype=np.int32)
+        byte_ids[list(byte_to_idx)] = list(byte_to_idx.values())
+        ids = byte_ids[np.frombuffer(b"".join(pretoken_counts), dtype=np.uint8)]
+        counts = np.fromiter(pretoken_counts.values(), dtype=np.int64, count=len(pretoken_counts))
+        return cls(ids, offsets, counts)
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    def __getitem__(self, word_idx: int) -> list[int]:
+        start = self.offsets[word_idx]
+        return self.ids[start:start + self.lengths[word_idx]].tolist()
+
+    def __setitem__(self, word_idx: int, word: list[int]):
+        if len(word) > self.lengths[word_idx]:
+            raise ValueError("words can only get shorter")
+        start = self.offsets[word_idx]
+        self.ids[start:start + len(word)] = word
+        self.lengths[word_idx] = len(word)
+
+    def pairs(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(left ids, right ids, word index) of every adjacent pair of every word, vectorized."""
+        num_pairs = np.maximum(self.lengths.astype(np.int64) - 1, 0)
+        word_of_pair = np.repeat(np.arange(len(self), dtype=np.int64), num_pairs)
+        first_pair = np.cumsum(num_pairs) - num_pairs
+        positions = self.offsets[word_of_pair] + np.arange(len(word_of_pair)) - first_pair[word_of_pair]
+        return self.ids[positions], self.ids[positions + 1], word_of_pair
+
+    def compacted(self) -> "WordTable":
+        """Copy without the space freed by merges, with `offsets` the running sum of the current lengths."""
+        offsets = np.zeros(len(self) + 1, dtype=np.int64)
+        np.cumsum(self.lengths, out=offsets[1:])
+        word_of_id = np.repeat(np.arange(len(self), dtype=np.int64), self.lengths)
+        ids = self.ids[self.offsets[word_of_id] + np.arange(len(word_of_id)) - offsets[word_of_id]]
+        return WordTable(ids, offsets, self.counts.copy())
+
+    def nbytes(self) -> int:
+        return self.ids.nbytes + self.offsets.nbytes + self.counts.nbytes + self.lengths.nbytes
+
+
+def group_pairs(words: WordTable) -> tuple[list[tuple[int, int]], list[int], list[int], list[int]]:
+    """
+    Every distinct adjacent pair of `words` with its total count, and the word indices of all pairs in pair
+    order: the words pair i occurs in are `word_of_pair[bounds[i]:bounds[i + 1]]`.
+    """
+    # pairs are grouped by sorting them on a single int64 key, so python only visits each distinct pair once
+    left, right, word_of_pair = words.pairs()
+    keys = left.astype(np.int64) << 32 | right.astype(np.int64)
+    order = np.argsort(keys, kind="stable")
+    keys, word_of_pair = keys[order], word_of_pair[order]
+    starts = np.flatnonzero(np.diff(keys, prepend=-1))
+    counts = np.add.reduceat(words.counts[word_of_pair], starts).tolist()
+    pairs = [(key >> 32, key & 0xFFFFFFFF) for key in keys[starts].tolist()]
+    return pairs, counts, word_of_pair.tolist(), np.append(starts, len(keys)).tolist()
+
+
+class PairIndex:
+    """
+    The pair counts of a `WordTable` and an inverted index from every pair to the words it occurs in,
+    kept up to date as pairs are merged. A merge only revisits the words containing the merged pair.
+    """
+    def __init__(self, words: WordTable):
+        self.words = words
+        pairs, counts, word_of_pair, bounds = group_pairs(words)
+        self.pair_counts: defaultdict[tuple[int, int], int] = defaultdict(int, zip(pairs, counts))
+        self.pair_words: defaultdict[tuple[int, int], set[int]] = defaultdict(set, (
+            (pair, set(word_of_pair[bounds[i]:bounds[i + 1]])) for i, pair in enumerate(pairs)
+        ))
+
+    def merge_pair(self, pair: tuple[int, int], new_idx: int) -> dict[tuple[int, int], int]:
+        """Replace every occurrence of `pair` by `new_idx`, and return the nonzero change of every pair count."""
+        deltas = defaultdict(int)
+        for word_idx in self.pair_words.pop(pair, ()):
+            word = self.words[word_idx]
+            merged = _merge_word(word, pair, new_idx)
+            if len(merged) == len(word):
+                continue  # the index is not pruned when a word loses a pair
+            count = int(self.words.counts[word_idx])
+            for old_pair in zip(word, word[1:]):
+                deltas[old_pair] -= count
+            for new_pair in zip(merged, merged[1:]):
+                deltas[new_pair] += count
+                self.pair_words[new_pair].add(word_idx)
+            self.words[word_idx] = merged
+        for changed_pair in self._apply_deltas(deltas):
+            if changed_pair not in self.pair_counts:
+                self.pair_words.pop(changed_pair, None)
+        return deltas
+
+    def _apply_deltas(self, deltas: dict[tuple[int, int], int]) -> dict[tuple[int, int], int]:
+        """Add `deltas` to the pair counts, dropping pairs whose count reaches zero, and keep the nonzero deltas."""
+        for changed_pair, delta in list(deltas.items()):
+            if not delta:
+                del deltas[changed_pair]
+            elif (self.pair_counts[changed_pair] + delta) > 0:
+                self.pair_counts[changed_pair] += delta
+            else:
+                del self.pair_counts[changed_pair]
+        return deltas
+
+    def index_sizes(self) -> dict[str, int]:
+        """Words, distinct pairs, pair -> word index entries and word table bytes."""
+        return {
+            "words": len(self.words),
+            "pairs": len(self.pair_counts),
+            "index_entries": sum(map(len, self.pair_words.values())),
+            "word_table_bytes": self.words.nbytes(),
+        }
+
+
+class BPETrainer(PairIndex):
+    """
+    Merge phase of BPE training: repeatedly merge the most frequent adjacent pair of a `WordTable`
+    into a new token.
+
+    Pair counts are kept up to date incrementally by `PairIndex`, and the next pair is popped from a
+    max-heap keyed by (count, bytes of the pair). Heap entries are not removed when a count changes, an
+    entry is skipped when it no longer matches the current count.
+
+    The state can be saved with `save` and restored with `load`. Only the words, the vocab and the
+    merges are stored; pair counts, index and heap are rebuilt from the words on load.
+    """
+    def __init__(self, words: WordTable | dict[tuple[int, ...], int], vocab: dict[int, bytes],
+                 merge_pairs: list[tuple[int, int]] | None = None):
+        """
+        Args:
+            words (WordTable | dict[tuple[int, ...], int]): token ids of every distinct pretoken and its count.
+            vocab (dict[int, bytes]): vocab the ids refer to. New tokens are added to it.
+            merge_pairs (list[tuple[int, int]] | None): ids of the merges already applied to `words`.
+        """
+        self.vocab = vocab
+        self.merge_pairs = list(merge_pairs or [])
+        self._next_idx = max(vocab) + 1
+        self._init_index(words if isinstance(words, WordTable) else WordTable.from_words(words))
+        self._heap = [self._heap_entry(pair) for pair in self.pair_counts]
+        heapq.heapify(self._heap)
+
+    def _init_index(self, words: WordTable):
+        """Set up `pair_counts` and whatever `merge_pair` needs to keep them up to date."""
+        PairIndex.__init__(self, words)
+
+    @property
+    def merges(self) -> list[tuple[bytes, bytes]]:
+        return [(self.vocab[a], self.vocab[b]) for a, b in self.merge_pairs]
+
+    def index_sizes(self) -> dict[str, int]:
+        """`PairIndex.index_sizes` and the entries in the heap, stale ones included."""
+        return {"heap_entries": len(self._heap), **super().index_sizes()}
+
+    def _heap_entry(self, pair: tuple[int, int]) -> tuple:
+        return -self.pair_counts[pair], _Descending((self.vocab[pair[0]], self.vocab[pair[1]])), pair
+
+    def best_pair(self) -> tuple[int, int] | None:
+        """The pair the next merge would merge, or None if every word is a single token."""
+        while self._heap:
+            neg_count, _, pair = self._heap[0]
+            if self.pair_counts.get(pair, 0) == -neg_count:
+                return pair
+            heapq.heappop(self._heap)  # stale entry
+        return None
+
+    def merge(self, pair: tuple[int, int], new_idx: int | None = None) -> int:
+        """
+        Replace every occurrence of `pair` by a new token and return its id. `new_idx` is the id to use
+        if the token is already in the vocab (when replaying merges); by default the next free id is taken.
+        """
+        if new_idx is None:
+            new_idx = self._next_idx
+            self.vocab[new_idx] = self.vocab[pair[0]] + self.vocab[pair[1]]
+        self._next_idx = max(self._next_idx, new_idx + 1)
+        self.merge_pairs.append(pair)
+        for changed_pair in self.merge_pair(pair, new_idx):
+            if changed_pair in self.pair_counts:
+                heapq.heappush(self._heap, self._heap_entry(changed_pair))
+        return new_idx
+
+    def close(self):
+        """Release what the trainer holds besides memory; nothing for the serial trainer."""
+
+    def __enter__(self) -> "BPETrainer":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def train(self, vocab_size: int, checkpoint_path: str | os.PathLike | None = None,
+              checkpoint_every: int | None = None, metadata: dict | None = None,
+              profiler: TrainingProfiler | None = None):
+        """
+        Merge until the vocab has `vocab_size` entries or no pair is left. With `checkpoint_path`, the
+        state is saved every `checkpoint_every` merges (if given) and once at the end, with `metadata`.
+        `profiler` is told about every merge.
+        """
+        if profiler is not None:
+            profiler.start_merges(self, vocab_size)
+        while len(self.vocab) < vocab_size and (pair := self.best_pair()) is not None:
+            self.merge(pair)
+            if profiler is not None:
+                profiler.on_merge(self)
+            if checkpoint_path is not None and checkpoint_every and len(self.merge_pairs) % checkpoint_every == 0:
+                self.save(checkpoint_path, metadata)
+        if profiler is not None:
+            profiler.end_merges(self)
+        if checkpoint_path is not None:
+            self.save(checkpoint_path, metadata)
+
+    def save(self, path: str | os.PathLike, metadata: dict | None = None):
+        """Write the state to `path` as a `.npz` file, replacing it atomically. `metadata` must be json serializable."""
+        vocab_ids = np.array(sorted(self.vocab), dtype=np.int64)
+        vocab_lengths = np.array([len(self.vocab[idx]) for idx in vocab_ids.tolist()], dtype=np.int64)
+        words = self.words.compacted()
+        arrays = {
+            "vocab_ids": vocab_ids,
+            "vocab_offsets": np.concatenate([[0], np.cumsum(vocab_lengths)]),
+            "vocab_blob": np.frombuffer(b"".join(self.vocab[idx] for idx in vocab_ids.tolist()), dtype=np.uint8),
+            "merge_pairs": np.array(self.merge_pairs, dtype=np.int64).reshape(-1, 2),
+            "word_ids": words.ids,
+            "word_offsets": words.offsets,
+            "word_counts": words.counts,
+            "metadata": np.array(json.dumps(metadata or dict())),
+        }
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, **arrays)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path: str | os.PathLike, **kwargs) -> tuple["BPETrainer", dict]:
+        """Restore a trainer written by `save`, and the metadata saved with it. `kwargs` go to the constructor."""
+        with np.load(path) as checkpoint:
+            blob = checkpoint["vocab_blob"].tobytes()
+            offsets = checkpoint["vocab_offsets"].tolist()
+            vocab = {idx: blob[offsets[i]:offsets[i + 1]] for i, idx in enumerate(checkpoint["vocab_ids"].tolist())}
+            words = WordTable(
+                checkpoint["word_ids"].astype(np.int32), checkpoint["word_offsets"], checkpoint["word_counts"]
+            )
+            merge_pairs = [tuple(pair) for pair in checkpoint["merge_pairs"].tolist()]
+            metadata = json.loads(str(checkpoint["metadata"]))
+        return cls(words, vocab, merge_pairs, **kwargs), metadata
+
+
+def learn_merges(
+    words: dict[tuple[int, ...], int], vocab: dict[int, bytes], vocab_size: int
+) -> list[tuple[bytes, bytes]]:
+    """
+    Merge the most frequent pair of `words` (token ids -> count) until `vocab` has `vocab_size` entries
+    or no pair is left. New tokens are added to `vocab`; the merges are returned in order.
+    """
+    trainer = BPETrainer(words, vocab)
+    trainer.train(vocab_size)
+    return trainer.merges
+
+
+def train_bpe(
+    input_path: str | os.PathLike,
+    vocab_size: int,
+    special_tokens: list[str],
+    num_workers: int | None = None,
+    chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+    memory_budget: int | None = None,
+    spill_dir: str | os.PathLike | None = None,
+    min_count: int = 1,
+    checkpoint_path: str | os.PathLike | None = None,
+    checkpoint_every: int = DEFAULT_CHECKPOINT_EVERY,
+    initial_vocab: dict[int, bytes] | None = None,
+    initial_merges: list[tuple[bytes, bytes]] | None = None,
+    profiler: TrainingProfiler | None = None,
+    merge_workers: int = 1,
+) -> tuple[dict[int, bytes], list[tuple[bytes, bytes]]]:
+    """
+    Train a byte-level BPE tokenizer on a text file.
+
+    Args:
+        input_path (str | os.PathLike): training text.
+        vocab_size (int): size of the final vocab, including the 256 bytes and the special tokens.
+        special_tokens (list[str]): added to the vocab first, and never merged with other text.
+        num_workers (int | None): processes used to count pretokens. Defaults to the number of cpus.
+        chunk_bytes (int): target size of the pieces read at a time while counting.
+        memory_budget (int | None): bound on the memory used for partial pretoken counts, see `count_pretokens`.
+        spill_dir (str | os.PathLike | None): directory for spilled counts, see `count_pretokens`.
+        min_count (int): pretokens seen fewer times than this are not trained on. 1 (the default) keeps
+            all of them and gives exact BPE; higher values shrink the word table of very large corpora.
+        checkpoint_path (str | os.PathLike | None): the training state is saved here every
+            `checkpoint_every` merges and at the end. If the file already exists, training resumes
+            from it instead of starting over; it must come from the same input and special tokens.
+        checkpoint_every (int): merges between checkpoints.
+        initial_vocab (dict[int, bytes] | None): with `initial_merges`, the result of an earlier training
+            run to extend. Its merges are replayed on the pretoken counts and training continues from
+            there, with the same result as training to `vocab_size` in one go.
+        initial_merges (list[tuple[bytes, bytes]] | None): merges of `initial_vocab`, in order.
+        profiler (TrainingProfiler | None): records the time and memory of every phase of the run and
+            samples the merge rate, see `bpe_profiler`.
+        merge_workers (int): with more than one, the word table is sharded across this many processes
+            during the merge phase, see `ShardedBPETrainer`. The merges are the same.
+
+    Returns:
+        tuple[dict[int, bytes], list[tuple[bytes, bytes]]]: the vocab (id -> bytes) and the merges in
+        the order they were learned. Of several most frequent pairs, the lexicographically greatest is merged.
+    """
+    special_tokens = list(dict.fromkeys(special_tokens))
+    metadata = {
+        "input_path": os.path.abspath(input_path),
+        "input_size": os.path.getsize(input_path),
+        "special_tokens": special_tokens,
+        "min_count": min_count,
+    }
+    trainer_cls, trainer_kwargs = BPETrainer, dict()
+    if merge_workers > 1:
+        from .sharded_bpe_trainer import ShardedBPETrainer
+        trainer_cls, trainer_kwargs = ShardedBPETrainer, {"num_shards": merge_workers}
+
+    resumed = checkpoint_path is not None and os.path.exists(checkpoint_path)
+    if resumed:
+        with _phase(profiler, "load_checkpoint"):
+            trainer, saved = trainer_cls.load(checkpoint_path, **trainer_kwargs)
+        if saved != metadata:
+            trainer.close()
+            raise ValueError(f"checkpoint {checkpoint_path} was written for a different run: {saved}")
+    else:
+        if initial_vocab is None:
+            vocab = {idx: token.encode("utf-8") for idx, token in enumerate(special_tokens)}
+            for b in range(256):
+                vocab[len(vocab)] = bytes([b])
+        else:
+            vocab = dict(initial_vocab)
+            missing = [token for token in special_tokens if token.encode("utf-8") not in set(vocab.values())]
+            for token in missing:
+                vocab[max(vocab) + 1] = token.encode("utf-8")
+        byte_to_idx = {token[0]: idx for idx, token in vocab.items() if len(token) == 1}
+
+        word_counts = count_pretokens(
+            input_path, special_tokens, num_workers, chunk_bytes, memory_budget=memory_budget, spill_dir=spill_dir,
+            min_count=min_count, profiler=profiler,
+        )
+        with _phase(profiler, "build_word_table"):
+            words = WordTable.from_pretoken_counts(word_counts, byte_to_idx)
+            del word_counts
+        with _phase(profiler, "build_index"):
+            trainer = trainer_cls(words, vocab, **trainer_kwargs)
+            del words
+    with trainer:
+        if initial_merges and not resumed:
+            with _phase(profiler, "replay_merges"):
+                bytes_to_idx = {token: idx for idx, token in trainer.vocab.items()}
+                for left, right in initial_merges:
+                    trainer.merge((bytes_to_idx[left], bytes_to_idx[right]), bytes_to_idx[left + right])
+        if profiler is not None:
+            profiler.record(initial_index=trainer.index_sizes())
+        with _phase(profiler, "merge"):
+            trainer.train(vocab_size, checkpoint_path, checkpoint_every, metadata, profiler)
+        with _phase(profiler, "assemble_vocab"):
+            vocab, merges = trainer.vocab, trainer.merges
+    return vocab, merges
@@ -1,9 +1,14 @@
 from __future__ import annotations
 
+import json
 import pathlib
 from functools import lru_cache
 
+from cs336_basics.bpe_tokenizer import BPETokenizerParams
+
 FIXTURES_PATH = (pathlib.Path(__file__).resolve().parent) / "fixtures"
+GPT2_VOCAB_PATH = FIXTURES_PATH / "gpt2_vocab.json"
+GPT2_MERGES_PATH = FIXTURES_PATH / "gpt2_merges.txt"
 
 
 @lru_cache
@@ -52,3 +57,19 @@ def gpt2_bytes_to_unicode() -> dict[int, str]:
     characters = [chr(n) for n in cs]
     d = dict(zip(bs, characters))
     return d
+
+
+def load_gpt2_params(special_tokens: list[str] | None = None) -> BPETokenizerParams:
+    """GPT-2 vocab and merges from the test fixtures, with the byte-to-unicode remapping undone."""
+    gpt2_byte_decoder = {v: k for k, v in gpt2_bytes_to_unicode().items()}
+    with open(GPT2_VOCAB_PATH) as f:
+        gpt2_vocab = json.load(f)
+    vocab = {index: bytes([gpt2_byte_decoder[c] for c in token]) for token, index in gpt2_vocab.items()}
+    merges = []
+    with open(GPT2_MERGES_PATH) as f:
+        for line in f:
+            cleaned_line = line.rstrip()
+            if cleaned_line and len(cleaned_line.split(" ")) == 2:
+                t1, t2 = cleaned_line.split(" ")
+                merges.append((bytes([gpt2_byte_decoder[c] for c in t1]), bytes([gpt2_byte_decoder[c] for c in t2])))
+    return BPETokenizerParams(vocab, merges, special_tokens)
@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import io
+
+import numpy as np
+import pytest
+
+from cs336_basics.bpe_tokenizer import BPETokenizer, BPETokenizerParams
+from cs336_basics.tokenizer_pool import TokenizerPool, _groups
+
+from .common import FIXTURES_PATH, load_gpt2_params
+
+
+@pytest.fixture(scope="module")
+def corpus() -> str:
+    with open(FIXTURES_PATH / "tinystories_sample.txt") as f:
+        return f.read()
+
+
+def test_cache_counters(corpus):
+    tokenizer = BPETokenizer(load_gpt2_params())
+    ids = tokenizer.encode(corpus)
+    info = tokenizer.cache_info()
+    assert info.misses == info.size
+    assert info.hits > info.misses
+    assert info.evictions == 0
+    assert tokenizer.encode(corpus) == ids
+    assert tokenizer.cache_info().misses == info.misses
+
+    tokenizer.cache_clear()
+    assert tokenizer.cache_info() == (0, 0, 0, 0, BPETokenizer.DEFAULT_CACHE_SIZE)
+
+
+def test_cache_is_bounded(corpus):
+    tokenizer = BPETokenizer(load_gpt2_params(), cache_size=8)
+    uncached = BPETokenizer(load_gpt2_params(), cache_size=0)
+    assert tokenizer.encode(corpus) == uncached.encode(corpus)
+    info = tokenizer.cache_info()
+    assert info.size == 8
+    assert info.evictions == info.misses - 8
+    assert uncached.cache_info() == (0, 0, 0, 0, 0)
+
+
+def test_vocab_entry_that_does_not_merge_back():
+    # "abc" is in the vocab as a + bc, but the earlier merge a + b leaves "abc" as ab, c
+    vocab = {i: bytes([i]) for i in range(256)} | {256: b"ab", 257: b"bc", 258: b"abc"}
+    merges = [(b"a", b"b"), (b"b", b"c"), (b"a", b"bc")]
+    tokenizer = BPETokenizer(BPETokenizerParams(vocab, merges, None), cache_size=0)
+    assert tokenizer.encode("bc abc abc") == [257, 32, 256, 99, 32, 256, 99]
+
+
+def test_count_tokens_and_max_tokens(corpus):
+    tokenizer = BPETokenizer(load_gpt2_params(["<|endoftext|>"]))
+    text = corpus + "<|endoftext|> Grüße 😀"
+    ids = tokenizer.encode(text)
+    assert tokenizer.count_tokens(text) == len(ids)
+    assert tokenizer.count_tokens("") == 0
+    for max_tokens in [0, 1, 2, 17, len(ids) - 1, len(ids), len(ids) + 5]:
+        assert tokenizer.encode(text, max_tokens=max_tokens) == ids[:max_tokens]
+    with pytest.raises(ValueError):
+        tokenizer.encode(text, max_tokens=-1)
+
+    # only the start of a long text is tokenized
+    tokenizer.cache_clear()
+    tokenizer.encode(corpus * 10, max_tokens=5)
+    assert tokenizer.cache_info().misses <= 5
+
+
+def test_truncate(corpus):
+    tokenizer = BPETokenizer(load_gpt2_params(["<|endoftext|>"]))
+    text = corpus + "<|endoftext|> Grüße 😀"
+    ids = tokenizer.encode(text)
+    assert tokenizer.truncate(text, len(ids)) == text
+    assert tokenizer.truncate(text, 0) == ""
+    truncated = tokenizer.truncate(text, 50)
+    assert text.startswith(truncated)
+    assert tokenizer.encode(truncated) == ids[:50]
+
+    # a character split across tokens is dropped rather than replaced
+    smile = tokenizer.encode("😀")
+    assert tokenizer.truncate("😀", len(smile) - 1) == ""
+
+
+def test_encode_iterable_spans_elements(corpus):
+    tokenizer = BPETokenizer(load_gpt2_params(["<|endoftext|>", "<|endoftext|><|endoftext|>"]))
+    text = corpus + "we'll<|endoftext|><|endoftext|>  \n\n don't<|endoftext|>"
+    pieces = [text[i : i + 7] for i in range(0, len(text), 7)]
+    assert list(tokenizer.encode_iterable(pieces)) == tokenizer.encode(text)
+
+
+@pytest.mark.parametrize("buffer_size", [1, 5, 64])
+def test_encode_stream_matches_encode(corpus, buffer_size):
+    tokenizer = BPETokenizer(load_gpt2_params(["<|endoftext|>"]))
+    # a single line with multi-byte characters, so buffers split characters and special tokens
+    text = corpus.replace("\n", " ü€😀 ")
+    expected = tokenizer.encode(text)
+    assert list(tokenizer.encode_stream(io.BytesIO(text.encode("utf-8")), buffer_size)) == expected
+    assert list(tokenizer.encode_stream(io.StringIO(text), buffer_size)) == expected
+
+
+def test_incremental_decoder(corpus):
+    tokenizer = BPETokenizer(load_gpt2_params())
+    text = corpus + " Grüße 😀 ありがとう"
+    ids = tokenizer.encode(text)
+    decoder = tokenizer.incremental_decoder()
+    pieces = [decoder.feed(token) for token in ids]
+    assert "�" not in "".join(pieces)
+    assert "".join(pieces) + decoder.flush() == text
+
+    # bytes of a multi-byte character are held back until it is complete
+    smile = tokenizer.encode("😀")
+    assert len(smile) > 1
+    assert [decoder.feed(token) for token in smile] == [""] * (len(smile) - 1) + ["😀"]
+    assert decoder.feed(smile[:1]) == ""
+    assert decoder.flush() == "�"
+    assert decoder.feed(smile) == "😀"
+
+
+def test_encode_to_array_and_decode_array(corpus):
+    tokenizer = BPETokenizer(load_gpt2_params(["<|endoftext|>"]))
+    text = corpus + "<|endoftext|> Grüße 😀"
+    ids = tokenizer.encode(text)
+    array = tokenizer.encode_to_array(text)
+    assert array.dtype == np.uint16
+    assert array.tolist() == ids
+    assert tokenizer.decode_array(array) == text
+    assert tokenizer.decode_array(array[:0]) == ""
+    assert tokenizer.encode_to_array("").tolist() == []
+
+    lines = text.splitlines(keepends=True)
+    chunks = list(tokenizer.encode_iterable_arrays(lines, chunk_tokens=100))
+    assert len(chunks) > 1
+    assert all(len(chunk) >= 100 for chunk in chunks[:-1])
+    assert np.concatenate(chunks).tolist() == ids
+
+
+def test_token_dtype_widens_for_large_vocabs():
+    params = load_gpt2_params()
+    params.vocab[70000] = b"<big>"
+    tokenizer = BPETokenizer(params)
+    assert tokenizer.token_dtype == np.uint32
+    assert tokenizer.encode_to_array(" the").tolist() == tokenizer.encode(" the")
+    assert tokenizer.decode_array(np.array([70000, 262])) == "<big> the"
+
+
+def test_encode_batch_in_pool(corpus):
+    tokenizer = BPETokenizer(load_gpt2_params(["<|endoftext|>"]))
+    texts = corpus.split("\n") + ["", "<|endoftext|>", "Grüße 😀"]
+    expected = [tokenizer.encode(text) for text in texts]
+    assert tokenizer.encode_batch(texts) == expected
+
+    tokenizer.start_pool(num_workers=2, group_size=200, inline_threshold=100)
+    try:
+        assert tokenizer.encode_batch(texts) == expected
+        assert tokenizer.decode_batch(expected) == texts
+        # tiny batches stay in the calling process
+        assert tokenizer.encode_batch(["hello"]) == [tokenizer.encode("hello")]
+    finally:
+        tokenizer.close_pool()
+    assert tokenizer.decode_batch(expected) == texts
+
+
+def test_pool_groups_spread_over_workers():
+    # 40 texts of 100 characters are far below one group, but still go to every worker
+    groups = _groups([100] * 40, group_size=TokenizerPool.DEFAULT_GROUP_SIZE, num_workers=4)
+    assert len(groups) >= 4
+    assert [i for start, end in groups for i in range(start, end)] == list(range(40))
+    assert _groups([100] * 40, group_size=1000) == [(0, 10), (10, 20), (20, 30), (30, 40)]
@@ -0,0 +1,32 @@
+from cs336_basics.chunking import find_boundaries, iter_chunks, plan_chunks
+from cs336_basics.pretokenization_example import find_chunk_boundaries
+
+
+def test_boundaries_move_to_the_nearest_split_token():
+    buffer = b"a" * 40 + b"|" + b"b" * 50 + b"#" + b"c" * 9
+    # the even split at 50 is 9 bytes after "|" and 41 before "#"
+    assert find_boundaries(buffer, 2, [b"|", b"#"]) == [0, 40, len(buffer)]
+    assert find_boundaries(buffer, 2, [b"#"]) == [0, 91, len(buffer)]
+    assert find_boundaries(buffer, 4, [b"|", b"#"]) == [0, 40, 91, len(buffer)]
+    assert find_boundaries(buffer, 2, [b"$"]) == [0, len(buffer)]
+    assert find_boundaries(b"", 4, [b"|"]) == [0]
+
+
+def test_plan_covers_the_file_in_balanced_chunks(tmp_path):
+    documents = [f"story {i} ".encode() * (1 + i * 7 % 23) for i in range(200)]
+    data = b"<|endoftext|>".join(documents)
+    input_path = tmp_path / "input.txt"
+    input_path.write_bytes(data)
+    spans = plan_chunks(input_path, [b"<|endoftext|>"], num_workers=4, chunk_bytes=len(data), chunks_per_worker=4)
+    assert len(spans) == 16
+    assert spans[0][0] == 0 and spans[-1][1] == len(data)
+    assert all(end == start for (_, end), (start, _) in zip(spans, spans[1:]))
+    assert all(data.startswith(b"<|endoftext|>", start) for start, _ in spans[1:])
+    # each boundary is at most half a document away from its even split, so a chunk at most one document
+    longest = max(map(len, documents)) + len(b"<|endoftext|>")
+    assert all(abs((end - start) - len(data) / 16) <= longest for start, end in spans)
+
+    assert b"".join(bytes(chunk) for chunk in iter_chunks(input_path, spans)) == data
+    assert plan_chunks(input_path, [], num_workers=4) == [(0, len(data))]
+    with open(input_path, "rb") as f:
+        assert find_chunk_boundaries(f, 4, b"<|endoftext|>") == find_boundaries(data, 4, [b"<|endoftext|>"])
@@ -0,0 +1,90 @@
+import pickle
+
+import pytest
+
+from cs336_basics.bpe_tokenizer import BPETokenizer
+from cs336_basics.compact_bpe_tokenizer import (
+    CompactBPETokenizer, CompactVocab, PairRankTable, TokenIdTable, memory_footprint,
+)
+
+from .common import FIXTURES_PATH, load_gpt2_params
+
+
+def test_compact_tokenizer_matches_dict_tokenizer():
+    tokenizer = BPETokenizer(load_gpt2_params(["<|endoftext|>"]))
+    compact = CompactBPETokenizer(load_gpt2_params(["<|endoftext|>"]))
+    with open(FIXTURES_PATH / "tinystories_sample.txt") as f:
+        text = f.read() + "<|endoftext|>Grüße 😀"
+    ids = tokenizer.encode(text)
+    assert compact.encode(text) == ids
+    assert compact.decode(ids) == text
+    assert list(compact.merges_idx) == tokenizer.merges_idx
+    assert memory_footprint(compact)["total"] < memory_footprint(tokenizer)["total"] / 4
+
+
+def test_compact_vocab():
+    vocab = {0: b"a", 1: b"", 2: b"bcd"}
+    compact = CompactVocab.from_dict(vocab)
+    assert dict(compact) == vocab
+    assert compact.join([2, 1, 0, 2]) == b"bcdabcd"
+    with pytest.raises(KeyError):
+        compact[3]
+    with pytest.raises(ValueError):
+        CompactVocab.from_dict({0: b"a", 2: b"b"})
+
+
+def test_pair_rank_table():
+    merges_idx = [((i % 7, i // 7), 100 + i) for i in range(200)] + [((0, 0), 999)]
+    table = PairRankTable.from_merges(merges_idx)
+    for rank, (pair, merged) in enumerate(merges_idx[:200]):
+        assert table.get(pair) == (rank, merged)
+    assert table.get((7, 0)) is None
+    assert len(table) == 201
+
+
+def test_token_id_table():
+    vocab = CompactVocab.from_dict({i: bytes([i % 50]) * (i // 50 + 1) for i in range(200)} | {200: b"a", 201: b"a"})
+    table = TokenIdTable.from_vocab(vocab)
+    for idx in range(200):
+        assert table.get(vocab[idx]) == idx
+    # a later id with the same bytes wins, like the bytes -> index dict
+    assert table.get(b"a") == table[b"a"] == 201
+    assert table.get(b"\x00" * 5) is None
+    with pytest.raises(KeyError):
+        table[b"zz"]
+    assert pickle.loads(pickle.dumps(table)).get(vocab[123]) == 123
+
+
+def test_binary_roundtrip(tmp_path):
+    tokenizer = BPETokenizer(load_gpt2_params(["<|endoftext|>", "<|endoftext|><|endoftext|>"]))
+    path = tmp_path / "gpt2.bpe"
+    tokenizer.save_binary(path)
+    loaded = CompactBPETokenizer.load_binary(path)
+    with open(FIXTURES_PATH / "german.txt") as f:
+        text = f.read() + "<|endoftext|><|endoftext|>"
+    ids = tokenizer.encode(text)
+    assert loaded.encode(text) == ids
+    assert loaded.decode(ids) == text
+    assert loaded.special_token_to_idx == tokenizer.special_token_to_idx
+    # every constructor sets up the same state
+    compact = CompactBPETokenizer(load_gpt2_params(["<|endoftext|>", "<|endoftext|><|endoftext|>"]))
+    assert vars(loaded).keys() == vars(compact).keys() == vars(tokenizer).keys() | {"binary_path"}
+
+    # pickling a mapped tokenizer maps the same file again rather than copying its tables
+    unpickled = pickle.loads(pickle.dumps(loaded))
+    assert unpickled.binary_path == str(path)
+    assert unpickled.encode(text) == ids
+
+
+def test_load_binary_rejects_other_files(tmp_path):
+    path = tmp_path / "vocab.json"
+    path.write_bytes(b"{}" * 64)
+    with pytest.raises(ValueError):
+        CompactBPETokenizer.load_binary(path)
+
+
+def test_compact_decode_array():
+    compact = CompactBPETokenizer(load_gpt2_params())
+    text = "Grüße, 😀 world"
+    ids = compact.encode_to_array(text)
+    assert compact.decode_array(ids) == text
@@ -0,0 +1,49 @@
+import torch
+
+from cs336_basics.model import TransformerLM
+
+
+def _model(vocab_size, d_model, n_layers, n_heads, d_ff, theta, context_length=32):
+    torch.manual_seed(0)
+    return TransformerLM(vocab_size, context_length, d_model, n_layers, n_heads, d_ff, theta)
+
+
+def test_cached_logits_match_full_forward(in_indices, vocab_size, d_model, n_layers, n_heads, d_ff, theta):
+    model = _model(vocab_size, d_model, n_layers, n_heads, d_ff, theta)
+    with torch.no_grad():
+        expected = model(in_indices)
+        kv_cache = model.make_kv_cache(batch_size=in_indices.shape[0])
+        # a prefill of several tokens, then one token at a time
+        chunks = [model(in_indices[:, :5], kv_cache=kv_cache)]
+        chunks += [model(in_indices[:, i:i + 1], kv_cache=kv_cache) for i in range(5, in_indices.shape[1])]
+    assert kv_cache.length == in_indices.shape[1]
+    torch.testing.assert_close(torch.cat(chunks, dim=1), expected, atol=1e-5, rtol=1e-4)
+
+
+def test_greedy_generate_matches_uncached_argmax(vocab_size, d_model, n_layers, n_heads, d_ff, theta):
+    model = _model(vocab_size, d_model, n_layers, n_heads, d_ff, theta)
+    prompt = [3, 14, 15, 92, 65]
+    generated = model.generate(prompt, max_new_tokens=8, temperature=0)
+
+    ids = list(prompt)
+    with torch.no_grad():
+        for _ in range(8):
+            ids.append(int(model(torch.tensor(ids))[-1].argmax()))
+    assert generated == ids[len(prompt):]
+    # a tiny top_p leaves only the most likely token
+    assert model.generate(prompt, max_new_tokens=8, top_p=1e-6) == generated
+
+
+def test_generate_stops(vocab_size, d_model, n_layers, n_heads, d_ff, theta):
+    model = _model(vocab_size, d_model, n_layers, n_heads, d_ff, theta, context_length=8)
+    prompt = [1, 2, 3, 4, 5]
+    greedy = model.generate(prompt, max_new_tokens=10, temperature=0)
+    # the last token is predicted from a full context
+    assert len(greedy) == 8 - len(prompt) + 1
+    stop_token = greedy[1]
+    expected = greedy[:greedy.index(stop_token)]
+    assert model.generate(prompt, max_new_tokens=10, temperature=0, stop_token=stop_token) == expected
+
+    generator = torch.Generator().manual_seed(0)
+    sampled = model.generate(prompt, max_new_tokens=2, temperature=0.8, top_p=0.9, generator=generator)
+    assert len(sampled) == 2 and all(0 <= token < vocab_size for token in sampled)
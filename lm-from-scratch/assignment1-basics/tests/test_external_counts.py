@@ -0,0 +1,38 @@
+import os
+from collections import Counter
+
+from cs336_basics import external_counts
+from cs336_basics.external_counts import SpillingCounter, merge_runs
+from cs336_basics.train_bpe import count_pretokens
+
+from .common import FIXTURES_PATH
+
+
+def test_spilled_runs_merge_to_the_same_counts(tmp_path, monkeypatch):
+    words = [f"w{i % 37}" for i in range(1000)] + ["é", "😀", "é"]
+    counter = SpillingCounter(tmp_path, max_entries=10)
+    for start in range(0, len(words), 25):
+        counter.update(words[start : start + 25])
+    counter.spill()
+    assert len(counter.runs) > 2
+
+    expected = {word.encode("utf-8"): count for word, count in Counter(words).items()}
+    # more runs than can be opened at once are merged in several passes
+    monkeypatch.setattr(external_counts, "MAX_MERGE_FANIN", 2)
+    merged = list(merge_runs(counter.runs, delete=True))
+    assert merged == sorted(expected.items())
+    assert os.listdir(tmp_path) == []
+
+
+def test_count_pretokens_with_memory_budget(tmp_path):
+    input_path = FIXTURES_PATH / "corpus.en"
+    expected = count_pretokens(input_path, ["<|endoftext|>"], num_workers=1)
+    spilled = count_pretokens(
+        input_path, ["<|endoftext|>"], num_workers=2, chunk_bytes=4096, memory_budget=200 * 128, spill_dir=tmp_path
+    )
+    assert spilled == expected
+    assert os.listdir(tmp_path) == []
+
+    pruned = count_pretokens(input_path, ["<|endoftext|>"], memory_budget=1 << 20, min_count=3)
+    assert pruned == {pretoken: count for pretoken, count in expected.items() if count >= 3}
+    assert count_pretokens(input_path, ["<|endoftext|>"], min_count=3) == pruned
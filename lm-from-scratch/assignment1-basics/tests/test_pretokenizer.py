@@ -0,0 +1,41 @@
+import pytest
+
+from cs336_basics import tokenizer
+from cs336_basics.pretokenizer import pretoken_spans, pretokenize
+from cs336_basics.tokenizer import pretokenize_regex
+
+from .common import FIXTURES_PATH
+
+TRICKY = (
+    "I'll say it's 'twas don't WE'LL we've 'sdm ' 're they're\n"
+    "  \t\n\n  x  　 y  12,345.6 ½ ² x² Ⅻ ❤️ 🙂🙂 naïve 中文 ُمرحبا ...!!?? \r\n"
+    "a\ud800b\x00\x85end   "
+)
+
+
+@pytest.mark.parametrize(
+    "fixture", ["tinystories_sample.txt", "corpus.en", "german.txt", "address.txt", "special_token_trailing_newlines.txt"]
+)
+def test_matches_regex_on_fixtures(fixture):
+    with open(FIXTURES_PATH / fixture) as f:
+        text = f.read()
+    assert list(pretokenize(text)) == list(pretokenize_regex(text))
+
+
+def test_tokenizer_module_exports_the_scanner():
+    assert tokenizer.pretokenize is pretokenize
+
+
+def test_matches_regex_on_tricky_text():
+    # short strings and long strings take different lookup paths
+    for text in [TRICKY, TRICKY * 10, "", " ", "'", "'ll", "\n \n", "a   "]:
+        assert list(pretokenize(text)) == list(pretokenize_regex(text))
+    for end in range(len(TRICKY)):
+        assert list(pretokenize(TRICKY[:end])) == list(pretokenize_regex(TRICKY[:end]))
+
+
+def test_spans():
+    text = "Hello, world! It's  2024."
+    spans = list(pretoken_spans(text))
+    assert [text[start:end] for start, end in spans] == list(pretokenize_regex(text))
+    assert list(pretoken_spans("")) == []
@@ -0,0 +1,45 @@
+import torch
+
+from cs336_basics.model import RotaryPositionalEmbedding, TransformerLM
+
+
+def _rotate(x, positions, theta):
+    # each adjacent pair (x[2i], x[2i + 1]) rotated by positions * theta^(-2i / d_k)
+    d_k = x.shape[-1]
+    angles = positions[:, None].double() * theta ** (-torch.arange(0, d_k, 2).double() / d_k)
+    pairs = x.double().unflatten(-1, (-1, 2))
+    cos, sin = angles.cos(), angles.sin()
+    even, odd = pairs[..., 0], pairs[..., 1]
+    return torch.stack((even * cos - odd * sin, even * sin + odd * cos), dim=-1).flatten(-2).float()
+
+
+def test_rope_extends_past_max_seq_len(theta):
+    torch.manual_seed(0)
+    rope = RotaryPositionalEmbedding(theta, d_k=16, max_seq_len=4)
+    x = torch.randn(2, 10, 16)
+    positions = torch.arange(30, 40)
+    # positions offset, offset + 1, ... slice the tables instead of gathering
+    torch.testing.assert_close(rope(x, offset=30), _rotate(x, positions, theta), atol=1e-5, rtol=1e-4)
+    assert len(rope.cos) >= 40
+    torch.testing.assert_close(rope(x, positions), rope(x, offset=30))
+
+    # explicit positions past the tables grow them, from a hint or from the positions themselves
+    x, positions = x[:, :2], torch.tensor([[100, 101], [7, 250]])
+    expected = torch.stack([_rotate(x[i], positions[i], theta) for i in range(2)])
+    for max_position in (250, None):
+        rope = RotaryPositionalEmbedding(theta, d_k=16, max_seq_len=4)
+        torch.testing.assert_close(rope(x, positions, max_position=max_position), expected, atol=1e-5, rtol=1e-4)
+        assert len(rope.cos) > 250
+
+
+def test_rope_tables_are_module_buffers(vocab_size, d_model, n_layers, n_heads, d_ff, theta):
+    model = TransformerLM(vocab_size, 16, d_model, n_layers, n_heads, d_ff, theta)
+    rope = model.layers[0].attn.rope
+    assert all(layer.attn.rope is rope for layer in model.layers)
+    # not saved, so reference state dicts still load
+    assert not any(key.endswith((".cos", ".sin")) for key in model.state_dict())
+    model.to(torch.bfloat16)
+    assert rope.cos.dtype == rope.sin.dtype == torch.bfloat16
+    x = torch.randn(3, d_model // n_heads, dtype=torch.bfloat16)
+    assert rope(x, offset=20).dtype == torch.bfloat16
+    assert rope.cos.dtype == torch.bfloat16 and len(rope.cos) >= 23
@@ -0,0 +1,30 @@
+from cs336_basics.special_tokens import SpecialTokenMatcher
+
+
+def test_split_prefers_longest_match():
+    matcher = SpecialTokenMatcher(["<|endoftext|>", "<|endoftext|><|endoftext|>", "<|im_start|>"])
+    text = "Hi<|endoftext|><|endoftext|><|endoftext|>x<|im_start|><|end"
+    assert matcher.split(text) == [
+        "Hi",
+        "<|endoftext|><|endoftext|>",
+        "",
+        "<|endoftext|>",
+        "x",
+        "<|im_start|>",
+        "<|end",
+    ]
+    assert list(matcher.finditer("a<|im_start|>")) == [(1, 13, "<|im_start|>")]
+
+
+def test_partial_suffix_start():
+    matcher = SpecialTokenMatcher(["<|endoftext|>", "<|endoftext|><|endoftext|>"])
+    assert matcher.partial_suffix_start("abc<|endo") == 3
+    assert matcher.partial_suffix_start("abc<|endoftext|>") == 3
+    assert matcher.partial_suffix_start("abc<|endoftext|><|endoftext|>") == 16
+    assert matcher.partial_suffix_start("abc|>") == 5
+
+
+def test_no_tokens():
+    matcher = SpecialTokenMatcher([])
+    assert matcher.split("a<|b") == ["a<|b"]
+    assert matcher.partial_suffix_start("a<|b") == 4
@@ -0,0 +1,75 @@
+import os
+import shutil
+
+import numpy as np
+
+from cs336_basics.bpe_tokenizer import BPETokenizer
+from cs336_basics.compact_bpe_tokenizer import CompactBPETokenizer
+from cs336_basics.token_cache import TokenCache
+
+from .common import FIXTURES_PATH, load_gpt2_params
+
+
+def test_hit_returns_memory_mapped_ids(tmp_path):
+    tokenizer = BPETokenizer(load_gpt2_params(["<|endoftext|>"]))
+    cache = TokenCache(tmp_path / "cache")
+    input_path = FIXTURES_PATH / "german.txt"
+    with open(input_path, encoding="utf-8", newline="") as f:
+        expected = tokenizer.encode(f.read())
+
+    ids = cache.tokenize_file(input_path, tokenizer)
+    assert ids.dtype == tokenizer.token_dtype
+    assert ids.tolist() == expected
+    ids = cache.tokenize_file(input_path, tokenizer)
+    assert isinstance(ids, np.memmap)
+    assert ids.tolist() == expected
+
+    # keyed by content, so a copy hits; tokenizers with the same vocab and merges share entries
+    copy_path = tmp_path / "copy.txt"
+    shutil.copy(input_path, copy_path)
+    assert cache.tokenize_file(copy_path, CompactBPETokenizer(load_gpt2_params(["<|endoftext|>"]))).tolist() == expected
+    stats = cache.stats()
+    assert (stats.hits, stats.misses, stats.entries) == (2, 1, 1)
+    assert stats.size_bytes == 2 * len(expected)
+
+
+def test_changed_file_or_tokenizer_misses(tmp_path):
+    tokenizer = BPETokenizer(load_gpt2_params(["<|endoftext|>"]))
+    cache = TokenCache(tmp_path / "cache")
+    input_path = tmp_path / "input.txt"
+    input_path.write_text("hello world<|endoftext|>")
+    cache.tokenize_file(input_path, tokenizer)
+    assert cache.tokenize_file(input_path, BPETokenizer(load_gpt2_params())).tolist() == BPETokenizer(
+        load_gpt2_params()
+    ).encode("hello world<|endoftext|>")
+
+    input_path.write_text("hello there")
+    os.utime(input_path, ns=(0, 0))
+    assert cache.tokenize_file(input_path, tokenizer).tolist() == tokenizer.encode("hello there")
+    assert cache.stats().misses == 3
+    empty_path = tmp_path / "empty.txt"
+    empty_path.write_text("")
+    assert cache.tokenize_file(empty_path, tokenizer).tolist() == []
+
+
+def test_evicts_least_recently_used(tmp_path):
+    tokenizer = BPETokenizer(load_gpt2_params())
+    paths = []
+    for i in range(3):
+        paths.append(tmp_path / f"{i}.txt")
+        paths[-1].write_text(f"document number {i} " * 10)
+    entry_bytes = 2 * len(tokenizer.encode("document number 0 " * 10))
+    cache = TokenCache(tmp_path / "cache", max_bytes=2 * entry_bytes)
+
+    cache.tokenize_file(paths[0], tokenizer)
+    cache.tokenize_file(paths[1], tokenizer)
+    os.utime(cache.entry_path(cache.key(paths[1], tokenizer)), ns=(1, 1))
+    cache.tokenize_file(paths[0], tokenizer)  # now entry 1 is the least recently used
+    cache.tokenize_file(paths[2], tokenizer)
+    stats = cache.stats()
+    assert (stats.entries, stats.evictions) == (2, 1)
+    assert not os.path.exists(cache.entry_path(cache.key(paths[1], tokenizer)))
+    assert os.path.exists(cache.entry_path(cache.key(paths[0], tokenizer)))
+
+    cache.clear()
+    assert cache.stats().entries == 0
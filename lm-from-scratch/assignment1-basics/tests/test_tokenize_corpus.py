@@ -0,0 +1,20 @@
+import numpy as np
+
+from cs336_basics.bpe_tokenizer import BPETokenizer
+from cs336_basics.tokenize_corpus import load_shards, tokenize_to_shards
+
+from .common import FIXTURES_PATH, load_gpt2_params
+
+
+def test_tokenize_to_shards_matches_encode(tmp_path):
+    tokenizer = BPETokenizer(load_gpt2_params(["<|endoftext|>"]))
+    input_path = FIXTURES_PATH / "tinystories_sample.txt"
+    index = tokenize_to_shards(input_path, tmp_path, tokenizer, num_workers=2, chunk_bytes=1024)
+    assert len(index["shards"]) > 1
+    assert index["dtype"] == "uint16"
+
+    with open(input_path) as f:
+        expected = tokenizer.encode(f.read())
+    ids = np.concatenate(load_shards(tmp_path))
+    assert index["num_tokens"] == len(expected)
+    assert ids.tolist() == expected
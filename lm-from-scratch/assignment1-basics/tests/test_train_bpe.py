@@ -1,6 +1,11 @@
 import json
 import time
 
+import pytest
+
+from cs336_basics.bpe_profiler import TrainingProfiler
+from cs336_basics.train_bpe import BPETrainer, WordTable, count_pretokens, learn_merges, train_bpe
+
 from .adapters import run_train_bpe
 from .common import FIXTURES_PATH, gpt2_bytes_to_unicode
 
@@ -86,3 +91,110 @@ def test_train_bpe_special_tokens(snapshot):
             "merges": merges,
         },
     )
+
+
+def test_count_pretokens_in_parallel(tmp_path):
+    input_path = tmp_path / "input.txt"
+    input_path.write_text(("the cat sat<|endoftext|> on the mat.\n\n" * 50 + "<|endoftext|>") * 20)
+    serial = count_pretokens(input_path, ["<|endoftext|>"], num_workers=1)
+    assert serial[b" the"] == 1000
+    assert not any(b"<|" in pretoken for pretoken in serial)
+    assert count_pretokens(input_path, ["<|endoftext|>"], num_workers=4, chunk_bytes=256) == serial
+
+
+def test_learn_merges_breaks_ties_lexicographically():
+    vocab = {idx: bytes([b]) for idx, b in enumerate(b"abcst")}
+    a, b, c, s, t = range(5)
+    # ("s", "t") and ("a", "b") are equally frequent, the greater one is merged first
+    words = {(a, b): 2, (s, t): 2, (a, b, c): 1, (s, t, c): 1, (c, c): 1}
+    merges = learn_merges(words, vocab, 8)
+    assert merges == [(b"s", b"t"), (b"a", b"b"), (b"st", b"c")]
+    assert vocab[7] == b"stc"
+
+
+def test_word_table_merges_in_place():
+    pretoken_counts = {b"abab": 3, b"b": 1, b"ba": 2}
+    trainer = BPETrainer(WordTable.from_pretoken_counts(pretoken_counts, {b: b for b in range(256)}),
+                         {b: bytes([b]) for b in range(256)})
+    ids = trainer.words.ids
+    trainer.train(258)
+    assert trainer.merges == [(b"a", b"b"), (b"ab", b"ab")]
+    # "abab" shrank to a single token without moving, so there is a gap after it until compacted
+    assert trainer.words.ids is ids
+    assert [trainer.words[i] for i in range(3)] == [[257], [ord("b")], [ord("b"), ord("a")]]
+    compacted = trainer.words.compacted()
+    assert compacted.ids.tolist() == [257, ord("b"), ord("b"), ord("a")]
+    assert compacted.offsets.tolist() == [0, 1, 2, 4]
+    assert compacted.counts.tolist() == [3, 1, 2]
+
+
+def test_resume_from_checkpoint_matches_uninterrupted_run(tmp_path, monkeypatch):
+    input_path = FIXTURES_PATH / "corpus.en"
+    checkpoint_path = tmp_path / "checkpoint.npz"
+    expected = train_bpe(input_path, 500, ["<|endoftext|>"])
+
+    # interrupt the run after 120 merges, the last checkpoint was written after 100
+    merge = BPETrainer.merge
+
+    def interrupted_merge(self, pair, new_idx=None):
+        if len(self.merge_pairs) == 120:
+            raise KeyboardInterrupt
+        return merge(self, pair, new_idx)
+
+    monkeypatch.setattr(BPETrainer, "merge", interrupted_merge)
+    with pytest.raises(KeyboardInterrupt):
+        train_bpe(input_path, 500, ["<|endoftext|>"], checkpoint_path=checkpoint_path, checkpoint_every=50)
+    monkeypatch.undo()
+    assert len(BPETrainer.load(checkpoint_path)[0].merge_pairs) == 100
+
+    assert train_bpe(input_path, 500, ["<|endoftext|>"], checkpoint_path=checkpoint_path) == expected
+    with pytest.raises(ValueError):
+        train_bpe(input_path, 500, ["<|endoftext|>", "<pad>"], checkpoint_path=checkpoint_path)
+
+
+def test_warm_start_matches_training_in_one_go():
+    input_path = FIXTURES_PATH / "corpus.en"
+    vocab, merges = train_bpe(input_path, 400, ["<|endoftext|>"])
+    assert train_bpe(input_path, 500, ["<|endoftext|>"], initial_vocab=vocab, initial_merges=merges) == train_bpe(
+        input_path, 500, ["<|endoftext|>"]
+    )
+
+
+def test_profiler_reports_every_phase(tmp_path):
+    lines = (FIXTURES_PATH / "corpus.en").read_text().splitlines(keepends=True)
+    input_path = tmp_path / "input.txt"
+    input_path.write_text("<|endoftext|>".join("".join(lines[i : i + 20]) for i in range(0, len(lines), 20)))
+    expected = train_bpe(input_path, 500, ["<|endoftext|>"], num_workers=1)
+    profiler = TrainingProfiler(sample_every=50)
+    assert train_bpe(input_path, 500, ["<|endoftext|>"], num_workers=2, chunk_bytes=1 << 14, profiler=profiler) == expected
+
+    report_path = tmp_path / "report.json"
+    profiler.write_report(report_path)
+    report = json.loads(report_path.read_text())
+    phases = [phase["name"] for phase in report["phases"]]
+    assert phases == [
+        "plan_chunks", "pretokenize_and_count", "reduce_counts", "build_word_table", "build_index", "merge",
+        "assemble_vocab",
+    ]
+    assert all(phase["peak_rss_bytes"] >= phase["rss_bytes"] > 0 for phase in report["phases"])
+    num_merges = 500 - 257
+    assert report["stats"]["merges"]["count"] == num_merges
+    assert [sample["merges"] for sample in report["samples"]] == [*range(0, num_merges, 50), num_merges]
+    # the heap holds an entry for every live pair, plus stale ones
+    assert all(sample["heap_entries"] >= sample["pairs"] > 0 for sample in report["samples"])
+    assert report["samples"][0]["pairs"] == report["stats"]["initial_index"]["pairs"]
+    assert report["stats"]["initial_index"]["words"] == len(count_pretokens(input_path, ["<|endoftext|>"]))
+
+
+def test_sharded_merges_match_serial(tmp_path):
+    input_path = FIXTURES_PATH / "corpus.en"
+    expected = train_bpe(input_path, 700, ["<|endoftext|>"], num_workers=1)
+    assert train_bpe(input_path, 700, ["<|endoftext|>"], num_workers=1, merge_workers=3) == expected
+
+    # a sharded run resumes from a checkpoint like a serial one
+    checkpoint_path = tmp_path / "checkpoint.npz"
+    train_bpe(input_path, 400, ["<|endoftext|>"], num_workers=1, checkpoint_path=checkpoint_path)
+    resumed = train_bpe(input_path, 700, ["<|endoftext|>"], num_workers=1, checkpoint_path=checkpoint_path, merge_workers=2)
+    assert resumed == expected
+    trainer, _ = BPETrainer.load(checkpoint_path)
+    assert len(trainer.merge_pairs) == 700 - 257